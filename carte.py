@@ -0,0 +1,108 @@
+from typing import Dict, Iterator, List, Set, Tuple, Union
+
+from hitman import HC
+from geometrie import geometrie
+
+Case = Tuple[int, int]
+Contenu = Union[int, HC]
+
+# Contenus sur lesquels on peut avancer (l'arbitre refuse les murs et les gardes)
+PASSABLES = {
+    HC.EMPTY,
+    HC.PIANO_WIRE,
+    HC.CIVIL_N,
+    HC.CIVIL_E,
+    HC.CIVIL_S,
+    HC.CIVIL_W,
+    HC.SUIT,
+    HC.TARGET,
+}
+
+
+# Carte de connaissance de la phase 1 : une liste plate indexée par i * m + j, 0 pour une case
+# inconnue, sinon son contenu. Le nombre de cases inconnues et la frontière de vision (cases
+# connues passables dont un rayon de vision contient une case inconnue, obstacles non compris)
+# sont tenus à jour à chaque écriture, en O(longueur des rayons) : c'est parmi elles que le
+# planificateur cherche d'où observer. S'utilise comme le dictionnaire {(i, j): contenu} qu'elle
+# remplace ; to_dict() pour l'arbitre.
+class CarteConnaissance:
+    def __init__(self, n: int, m: int):
+        self.n = n
+        self.m = m
+        self._geo = geometrie(n, m)
+        self._cases: List[Contenu] = [0] * (n * m)
+        self._inconnues: Set[Case] = {(i, j) for i in range(n) for j in range(m)}
+        # Nombre de cases inconnues dans les rayons de vision de chaque case. Les rayons sont
+        # symétriques : les cases qui voient une case sont celles de ses propres rayons.
+        self._inconnues_en_vue: List[int] = [
+            sum(len(rayon) for rayon in self._geo.rayons[(i, j)].values())
+            for i in range(n) for j in range(m)
+        ]
+        self.frontiere: Set[Case] = set()
+
+    def _index(self, case: Case) -> int:
+        i, j = case
+        if not (0 <= i < self.n and 0 <= j < self.m):
+            raise KeyError(case)
+        return i * self.m + j
+
+    def __getitem__(self, case: Case) -> Contenu:
+        return self._cases[self._index(case)]
+
+    def get(self, case: Case, defaut=None):
+        i, j = case
+        if 0 <= i < self.n and 0 <= j < self.m:
+            return self._cases[i * self.m + j]
+        return defaut
+
+    def __setitem__(self, case: Case, contenu: Contenu):
+        index = self._index(case)
+        ancien = self._cases[index]
+        self._cases[index] = contenu
+        if (ancien == 0) != (contenu == 0):
+            delta = -1 if contenu != 0 else 1
+            if contenu != 0:
+                self._inconnues.discard(case)
+            else:
+                self._inconnues.add(case)
+            for rayon in self._geo.rayons[case].values():
+                for vue in rayon:
+                    self._inconnues_en_vue[self._index(vue)] += delta
+                    self._mettre_a_jour_frontiere(vue)
+        self._mettre_a_jour_frontiere(case)
+
+    def _mettre_a_jour_frontiere(self, case: Case):
+        index = self._index(case)
+        if self._cases[index] in PASSABLES and self._inconnues_en_vue[index] > 0:
+            self.frontiere.add(case)
+        else:
+            self.frontiere.discard(case)
+
+    @property
+    def nb_inconnues(self) -> int:
+        return len(self._inconnues)
+
+    def inconnues(self) -> List[Case]:
+        return sorted(self._inconnues)
+
+    def keys(self) -> Iterator[Case]:
+        return ((i, j) for i in range(self.n) for j in range(self.m))
+
+    def values(self) -> List[Contenu]:
+        return list(self._cases)
+
+    def items(self) -> Iterator[Tuple[Case, Contenu]]:
+        return zip(self.keys(), self._cases)
+
+    def __iter__(self) -> Iterator[Case]:
+        return self.keys()
+
+    def __contains__(self, case: Case) -> bool:
+        i, j = case
+        return 0 <= i < self.n and 0 <= j < self.m
+
+    def __len__(self) -> int:
+        return self.n * self.m
+
+    def to_dict(self) -> Dict[Case, Contenu]:
+        return dict(self.items())
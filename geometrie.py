@@ -0,0 +1,80 @@
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from hitman import HC
+
+Case = Tuple[int, int]
+
+# Déplacement d'une case dans chaque orientation
+DEPLACEMENTS: Dict[HC, Tuple[int, int]] = {
+    HC.N: (0, 1),
+    HC.E: (1, 0),
+    HC.S: (0, -1),
+    HC.W: (-1, 0),
+}
+
+# Garde qui regarde dans chaque orientation
+GARDE_ORIENTE: Dict[HC, HC] = {
+    HC.N: HC.GUARD_N,
+    HC.E: HC.GUARD_E,
+    HC.S: HC.GUARD_S,
+    HC.W: HC.GUARD_W,
+}
+
+# Tables géométriques d'une carte n x m, calculées une seule fois pour toutes les cases et
+# orientations : voisins, rayons de vision, cases d'où un garde voit une case, fenêtres d'écoute.
+# Les portées sont celles de l'arbitre : vision 3, garde 2, écoute 2 (fenêtre 5x5).
+class Geometrie:
+    def __init__(self, n: int, m: int, portee_vision: int = 3, portee_garde: int = 2, rayon_ecoute: int = 2):
+        self.n = n
+        self.m = m
+        cases = [(i, j) for i in range(n) for j in range(m)]
+
+        # voisin[case][orientation] : case atteinte en avançant, None hors de la carte
+        self.voisin: Dict[Case, Dict[HC, Optional[Case]]] = {}
+        # rayons[case][orientation] : cases vues depuis case, dans l'ordre, sans tenir compte des obstacles
+        self.rayons: Dict[Case, Dict[HC, List[Case]]] = {}
+        for i, j in cases:
+            self.voisin[(i, j)] = {}
+            self.rayons[(i, j)] = {}
+            for orientation, (di, dj) in DEPLACEMENTS.items():
+                rayon = [
+                    (i + d * di, j + d * dj)
+                    for d in range(1, portee_vision + 1)
+                    if 0 <= i + d * di < n and 0 <= j + d * dj < m
+                ]
+                self.rayons[(i, j)][orientation] = rayon
+                self.voisin[(i, j)][orientation] = rayon[0] if rayon else None
+
+        # portee_gardes[case] : (case du garde, valeur du garde, cases entre eux) pour chaque garde
+        # qui verrait case. Comme chez l'arbitre, la vue du garde s'arrête à la première case non
+        # vide : il ne voit case que si toutes les cases entre eux sont vides.
+        self.portee_gardes: Dict[Case, List[Tuple[Case, HC, List[Case]]]] = {}
+        for i, j in cases:
+            gardes = []
+            for orientation, (di, dj) in DEPLACEMENTS.items():
+                # Un garde tourné vers orientation voit case s'il est derrière elle, à portée
+                for d in range(1, portee_garde + 1):
+                    if 0 <= i - d * di < n and 0 <= j - d * dj < m:
+                        entre = [(i - k * di, j - k * dj) for k in range(1, d)]
+                        gardes.append(((i - d * di, j - d * dj), GARDE_ORIENTE[orientation], entre))
+            self.portee_gardes[(i, j)] = gardes
+
+        # bornes_ecoute[case] : (i_min, i_max, j_min, j_max) de la fenêtre d'écoute, coupée aux bords
+        self.bornes_ecoute: Dict[Case, Tuple[int, int, int, int]] = {}
+        self.fenetre_ecoute: Dict[Case, List[Case]] = {}
+        for i, j in cases:
+            bornes = (
+                max(i - rayon_ecoute, 0), min(i + rayon_ecoute, n - 1),
+                max(j - rayon_ecoute, 0), min(j + rayon_ecoute, m - 1),
+            )
+            self.bornes_ecoute[(i, j)] = bornes
+            self.fenetre_ecoute[(i, j)] = [
+                (x, y) for x in range(bornes[0], bornes[1] + 1) for y in range(bornes[2], bornes[3] + 1)
+            ]
+
+
+# Une seule table par taille de carte
+@lru_cache(maxsize=None)
+def geometrie(n: int, m: int) -> Geometrie:
+    return Geometrie(n, m)
@@ -3,9 +3,14 @@ import time
 
 from hitman import HC, HitmanReferee
 from pprint import pprint
-from typing import List, Tuple, Dict, Optional, Callable
+from typing import List, Tuple, Dict, Optional, Callable, Set
 from itertools import combinations
+import math
+import random
+import sys
 from reso_SAT import *
+from geometrie import Geometrie, geometrie
+from carte import CarteConnaissance, PASSABLES
 
 # alias de types
 Grid = List[List[int]]
@@ -15,30 +20,89 @@ Clause = List[Literal]
 ClauseBase = List[Clause]
 
 # Variables globales
-nbVar = len(HC)
+# Une case ne peut contenir que les 13 premières valeurs de HC : N, E, S et W sont des orientations
+# et n'ont pas de variable propositionnelle
+VALEURS_CASE = [value for value in HC if value not in (HC.N, HC.E, HC.S, HC.W)]
+# Comme chez l'arbitre, la vue s'arrête à la première case non vide : toute case connue autre
+# que EMPTY (personne, mur, objet) coupe un rayon de vision
+BLOQUANTS = [value for value in VALEURS_CASE if value != HC.EMPTY]
+nbVar = len(VALEURS_CASE)
 nbVar_reel = 0
 m = 0  # lignes
 n = 0  # colonnes
-liste_de_clauses: List[Clause] = []
+base_de_clauses = ClauseStore()
+solveur = IncrementalSolver()
+# None : solveur incrémental en mémoire, "workers" : processus résidents de reso_SAT qui gardent
+# la base chargée, sinon le nom d'un backend de reso_SAT (gophersat, minisat, kissat, python, portfolio)
+backend_sat: Optional[str] = None
+backend: Optional[SatBackend] = None
+pool: Optional[SolverPool] = None
+travailleurs: Optional[WorkerPool] = None
+# Avec un backend externe, n'envoyer que le cône d'influence de chaque demande
+decoupage_cone = True
+# Avec des workers ou un backend externe, une demande seule sur une grosse base est découpée en
+# cubes sur les gardes et civils possibles autour des cases demandées, résolus en parallèle
+decoupage_cubes = False
+# Taille de la base (en clauses) à partir de laquelle on découpe en cubes
+SEUIL_CUBES = 20000
+decoupe_courante: Optional[Tuple[int, ConeSlicer]] = None
+encodeur = DimacsEncoder()
+cache_demandes = QueryCache()
+# Derniers modèles complets de la base, essayés avant tout appel au solveur
+modeles = ModelPool()
+# Marque du solveur (nombre de littéraux fixés) jusqu'à laquelle les littéraux fixés sont reportés dans la base
+# et les domaines
+marque_fixes = 0
+# Écoutes déjà encodées : position -> nombre de personnes entendues
+ecoutes: Dict[Tuple[int, int], int] = {}
+# Marque du solveur (nombre de littéraux fixés) lors du dernier calcul du backbone
+marque_backbone = 0
+# Modèles tirés au hasard dans la base (version, littéraux vrais de chaque modèle) pour estimer les risques
+echantillon_modeles: Tuple[int, List[Set[int]]] = (-1, [])
+NB_MODELES_ECHANTILLON = 8
+# Domaine de chaque case : masque des valeurs de HC encore possibles
+domaines: Dict[Tuple[int, int], int] = {}
+OBJETS_UNIQUES = [HC.SUIT.value - 1, HC.PIANO_WIRE.value - 1, HC.TARGET.value - 1]
+MASQUE_GARDES = sum(1 << (val.value - 1) for val in [HC.GUARD_N, HC.GUARD_E, HC.GUARD_S, HC.GUARD_W])
+MASQUE_CIVILS = sum(1 << (val.value - 1) for val in [HC.CIVIL_N, HC.CIVIL_E, HC.CIVIL_S, HC.CIVIL_W])
+# Nombre de gardes et de civils donné par l'arbitre : (masque des valeurs, effectif)
+effectifs: List[Tuple[int, int]] = []
+# Nombre de cases candidates lors du dernier « au moins » posé pour chaque groupe
+candidates_encodees: Dict[int, int] = {}
+# Contraintes de cardinalité sur les cases (littéraux, au moins, au plus ou None) : leurs encodages
+# passent par des variables auxiliaires, l'énumération exhaustive les évalue directement
+cardinalites: List[Tuple[List[int], int, Optional[int]]] = []
+# Au-delà de ce nombre d'affectations des cases inconnues, on passe par le solveur
+SEUIL_ENUMERATION = 1 << 16
+# Énumération de la base courante : (version, énumérateur, affectations qui satisfont la base)
+enumeration_courante: Optional[Tuple[int, Optional[Tuple[BruteForceEnumerator, int]]]] = None
+# Tables géométriques de la carte courante (voisins, rayons, portée des gardes, écoute)
+geo: Optional[Geometrie] = None
+ORDRE_ORIENTATIONS = [HC.N, HC.E, HC.S, HC.W]
+# Risque d'être vu sur une case, vérifié au solveur : case -> (version de la base, risque)
+verdicts_securite: Dict[Tuple[int, int], Tuple[int, float]] = {}
 hr = HitmanReferee()
 
 
 # ------------------- DEBUT GESTION PHASE 1 -------------------
 
 
-def remove_duplicates(cb) -> ClauseBase:
-    unique_cb = set(tuple(sublist) for sublist in cb)
-    return [list(sublist) for sublist in unique_cb]
+# Alloue une variable auxiliaire (encodages de cardinalité), numérotée après celles des cases
+def nouvelle_variable() -> PropositionnalVariable:
+    global nbVar_reel
+    nbVar_reel += 1
+    return nbVar_reel
 
 
-def at_least_n(n: int, variables: List[int]) -> List[Clause]:
+# Encodage naïf : une clause par combinaison, sans variable auxiliaire
+def at_least_n_naif(n: int, variables: List[int]) -> List[Clause]:
     clauses = []
     for comb in combinations(variables, len(variables) - (n - 1)):
         clauses.append(list(comb))
     return clauses
 
 
-def at_most_n(n: int, variables: List[int]) -> List[Clause]:
+def at_most_n_naif(n: int, variables: List[int]) -> List[Clause]:
     clauses = []
     vars_neg = [i * -1 for i in variables]
     for comb in combinations(vars_neg, n + 1):
@@ -46,6 +110,68 @@ def at_most_n(n: int, variables: List[int]) -> List[Clause]:
     return clauses
 
 
+# Compteur séquentiel (Sinz 2005) : s[i][j] vrai si au moins j+1 des i+1 premiers littéraux sont vrais,
+# soit n*k variables auxiliaires et O(n*k) clauses
+def at_most_n_sequentiel(n: int, variables: List[int]) -> List[Clause]:
+    nb = len(variables)
+    s = [[nouvelle_variable() for _ in range(n)] for _ in range(nb - 1)]
+    clauses = [[-variables[0], s[0][0]]]
+    for j in range(1, n):
+        clauses.append([-s[0][j]])
+    for i in range(1, nb - 1):
+        x = variables[i]
+        clauses.append([-x, s[i][0]])
+        clauses.append([-s[i - 1][0], s[i][0]])
+        for j in range(1, n):
+            clauses.append([-x, -s[i - 1][j - 1], s[i][j]])
+            clauses.append([-s[i - 1][j], s[i][j]])
+        clauses.append([-x, -s[i - 1][n - 1]])
+    clauses.append([-variables[nb - 1], -s[nb - 2][n - 1]])
+    return clauses
+
+
+# Compteur séquentiel "descendant" : s[i][j] n'est vrai que si au moins j+1 des i+1 premiers
+# littéraux le sont, il suffit alors d'imposer s[N-1][n-1]
+def at_least_n_sequentiel(n: int, variables: List[int]) -> List[Clause]:
+    nb = len(variables)
+    s = [[nouvelle_variable() for _ in range(n)] for _ in range(nb)]
+    clauses = [[-s[0][0], variables[0]]]
+    for j in range(1, n):
+        clauses.append([-s[0][j]])
+    for i in range(1, nb):
+        x = variables[i]
+        clauses.append([-s[i][0], s[i - 1][0], x])
+        for j in range(1, n):
+            clauses.append([-s[i][j], s[i - 1][j], x])
+            clauses.append([-s[i][j], s[i - 1][j], s[i - 1][j - 1]])
+    clauses.append([s[nb - 1][n - 1]])
+    return clauses
+
+
+# Choix automatique de l'encodage : le compteur séquentiel (environ 6*N*n littéraux) n'est
+# utilisé que quand l'encodage naïf serait plus gros
+def encodage_naif_suffisant(nb_clauses: int, taille_clause: int, n: int, nb: int) -> bool:
+    return nb_clauses * taille_clause <= 6 * nb * max(n, 1)
+
+
+def at_least_n(n: int, variables: List[int]) -> List[Clause]:
+    if n <= 0:
+        return []
+    nb = len(variables)
+    if encodage_naif_suffisant(math.comb(nb, n - 1), nb - n + 1, n, nb):
+        return at_least_n_naif(n, variables)
+    return at_least_n_sequentiel(n, variables)
+
+
+def at_most_n(n: int, variables: List[int]) -> List[Clause]:
+    nb = len(variables)
+    if n >= nb:
+        return []
+    if n == 0 or encodage_naif_suffisant(math.comb(nb, n + 1), n + 1, n, nb):
+        return at_most_n_naif(n, variables)
+    return at_most_n_sequentiel(n, variables)
+
+
 def exactly_n(n: int, variables: List[int]) -> List[Clause]:
     if not variables:
         return []
@@ -58,6 +184,38 @@ def exactly_n(n: int, variables: List[int]) -> List[Clause]:
     return clauses
 
 
+# Vérification des encodages de cardinalité contre le comptage (python main.py --check) : pour
+# chaque affectation des variables, la formule (variables auxiliaires comprises) doit être
+# satisfaisable exactement quand le nombre de variables vraies respecte la contrainte
+def verifier_encodages(nb_max: int = 6, sortie=sys.stdout) -> int:
+    global nbVar_reel
+    encodages = [
+        ("at_least_n_naif", at_least_n_naif, lambda n, nb: 1 <= n <= nb, lambda k, n: k >= n),
+        ("at_least_n_sequentiel", at_least_n_sequentiel, lambda n, nb: 1 <= n <= nb, lambda k, n: k >= n),
+        ("at_least_n", at_least_n, lambda n, nb: True, lambda k, n: k >= n),
+        ("at_most_n_naif", at_most_n_naif, lambda n, nb: n < nb, lambda k, n: k <= n),
+        ("at_most_n_sequentiel", at_most_n_sequentiel, lambda n, nb: 1 <= n < nb, lambda k, n: k <= n),
+        ("at_most_n", at_most_n, lambda n, nb: True, lambda k, n: k <= n),
+        ("exactly_n", exactly_n, lambda n, nb: True, lambda k, n: k == n),
+    ]
+    erreurs = 0
+    for nb in range(1, nb_max + 1):
+        variables = list(range(1, nb + 1))
+        for n in range(nb + 1):
+            for nom, encodage, applicable, attendu in encodages:
+                if not applicable(n, nb):
+                    continue
+                nbVar_reel = nb
+                solveur = IncrementalSolver(nb)
+                solveur.add_clauses(encodage(n, variables))
+                for masque in range(1 << nb):
+                    hypotheses = [v if masque >> (v - 1) & 1 else -v for v in variables]
+                    if solveur.solve(hypotheses)[0] != attendu(bin(masque).count("1"), n):
+                        erreurs += 1
+                        sortie.write(f"écart : {nom}({n}, {variables}) sur {hypotheses}\n")
+    return erreurs
+
+
 # Transforme notre triplet représentant nos cas avec leur variables en une variable propositionnelle
 def cell_to_variable(i: int, j: int, val: int) -> PropositionnalVariable:
     return (i * nbVar * m) + (j * nbVar) + val + 1
@@ -103,6 +261,24 @@ def initialize_regles(status, map) -> ClauseBase:
     clauses_regle2 += exactly_n(1, liste_suit)
     clauses_regle2 += exactly_n(1, liste_piano)
     clauses_regle2 += exactly_n(1, liste_cible)
+    for liste in [liste_suit, liste_piano, liste_cible]:
+        cardinalites.append((liste, 1, 1))
+
+    # Règle 4: l'arbitre donne le nombre exact de gardes et de civils sur la carte. Seul le
+    # « au plus » est global (c'est lui qui prouve qu'une zone est sans garde) ; le « au moins »
+    # sur toute la carte multiplie les conflits, il est posé plus tard par contraintes_effectifs
+    clauses_regle4 = []
+    for valeurs, effectif in [
+        ([HC.GUARD_N, HC.GUARD_E, HC.GUARD_S, HC.GUARD_W], status["guard_count"]),
+        ([HC.CIVIL_N, HC.CIVIL_E, HC.CIVIL_S, HC.CIVIL_W], status["civil_count"]),
+    ]:
+        variables = [
+            cell_to_variable(i, j, val.value - 1)
+            for i in range(n) for j in range(m) for val in valeurs
+        ]
+        clauses_regle4 += at_most_n(effectif, variables)
+        # L'énumération exhaustive, elle, évalue l'effectif exact sans surcoût
+        cardinalites.append((variables, effectif, effectif))
 
     # Règle 3: la case de départ est toujours vide
     i = status["position"][0]
@@ -112,6 +288,7 @@ def initialize_regles(status, map) -> ClauseBase:
     liste_clauses.append([cell_to_variable(i, j, HC.EMPTY.value - 1)])
     liste_clauses += clauses_regle1
     liste_clauses += clauses_regle2
+    liste_clauses += clauses_regle4
 
     return liste_clauses
 
@@ -122,27 +299,30 @@ def gestion_bruit(status) -> ClauseBase:
     position_i = status["position"][0]
     position_j = status["position"][1]
 
-    # Chercher les cases concernées par l'écoute
-    liste_cases_environnantes = []
+    # Une écoute déjà encodée au même endroit n'apprend rien : on évite de faire grossir la base
+    # (et changer sa version) avec un nouveau compteur
+    if (position_i, position_j) in ecoutes:
+        return []
+    ecoutes[(position_i, position_j)] = status["hear"]
 
-    for i in range(position_i - 2, position_i + 3):
-        for j in range(position_j - 2, position_j + 3):
-            # On ne prend pas en compte les cases hors plateau
-            # Ainsi que la case sur laquelle on est
-            if (
-                (i != position_i or j != position_j)
-                and (i >= 0 and j >= 0)
-                and (i < n and j < m)
-            ):
-                # On ne s'intéresse qu'aux variables concernant les gardes et les civils
-                for k in range(HC.GUARD_N.value - 1, HC.CIVIL_W.value):
-                    liste_cases_environnantes.append(cell_to_variable(i, j, k))
+    # Chercher les cases concernées par l'écoute : la fenêtre est déjà coupée aux bords du plateau
+    # La case sur laquelle on est compte aussi : l'arbitre l'inclut dans l'écoute
+    # (on peut se tenir sur la case d'un civil)
+    liste_cases_environnantes = []
+    for i, j in geo.fenetre_ecoute[(position_i, position_j)]:
+        # On ne s'intéresse qu'aux variables concernant les gardes et les civils
+        for k in range(HC.GUARD_N.value - 1, HC.CIVIL_W.value):
+            liste_cases_environnantes.append(cell_to_variable(i, j, k))
 
     bruit = status["hear"]
     liste_clauses = []
-    # Notre limite de base c'est 3
-    if bruit < 2:
+    # L'arbitre arrête de compter à 5 : au-delà on sait seulement qu'il y en a au moins 5
+    if bruit < 5:
         liste_clauses += exactly_n(bruit, liste_cases_environnantes)
+        cardinalites.append((liste_cases_environnantes, bruit, bruit))
+    else:
+        liste_clauses += at_least_n(bruit, liste_cases_environnantes)
+        cardinalites.append((liste_cases_environnantes, bruit, None))
 
     return liste_clauses
 
@@ -160,250 +340,771 @@ def gestion_vision(status) -> ClauseBase:
     return liste_clauses
 
 
-def demande(pos_i, pos_j, orientation, map) -> Tuple[bool, bool, int, int]:
-    # orientations = [HC.N,HC.E,HC.S,HC.W]
+# Prépare la demande "la case voisine dans cette orientation est-elle safe ?" : renvoie le résultat
+# s'il est connu sans solveur, sinon None, avec les gardes qui la verraient et le potentiel de vision
+def preparer_demande(
+    pos_i, pos_j, orientation, map
+) -> Tuple[Optional[Tuple[bool, bool, int, int]], List[Tuple[Literal, List[Literal]]], int]:
     anyguard = [HC.GUARD_N, HC.GUARD_E, HC.GUARD_W, HC.GUARD_S]
-    liste_clauses = []
-    liste_clauses_intermediaire = []
-    offset_vision = []
-    offsets = []
-
-    offset_N = []
-    offset_S = []
-    offset_E = []
-    offset_W = []
-    blocking_items = [
-        HC.CIVIL_N,
-        HC.CIVIL_S,
-        HC.CIVIL_E,
-        HC.CIVIL_W,
-        HC.WALL,
-        HC.GUARD_N,
-        HC.GUARD_S,
-        HC.GUARD_E,
-        HC.GUARD_W,
-        HC.SUIT,
-        HC.PIANO_WIRE,
-    ]
 
     # Les valeurs de retour après le booléen sont: 2 si hors map, 1 si garde ou mur sur la case, 0 sinon
 
-    if orientation == HC.E:
-        offset_N = [(1, 1), (1, 2), (1, 3)]
-        offset_S = [(1, -1), (1, -2), (1, -3)]
-        offset_E = [(2, 0), (3, 0), (4, 0)]
-        offset_W = [(0, 0), (-1, 0), (-2, 0)]
+    # On vérifie qu'on ne veut pas aller en dehors de la map
+    destination = geo.voisin[(pos_i, pos_j)][orientation]
+    if destination is None:
+        return (False, False, 2, -1), [], -1  # 2 code erreur index
 
-        # On vérifie qu'on ne veut pas aller en dehors de la map
-        if pos_i + 1 >= n:
-            return False, False, 2, -1  # 2 code erreur index
+    # Vérification qu'il n'y a pas de garde ni de mur sur la case où on veut aller
+    if map[destination] in anyguard or map[destination] == HC.WALL:
+        return (False, False, 1, -1), [], -1  # Pas safe et 1 pour dire qu'il y a un mur ou un garde
 
-        # Vérification qu'il n'y a pas de garde ni de mur sur la case où on veut aller
-        for elem in anyguard:
-            if (
-                map[(pos_i + 1, pos_j)] == elem or map[(pos_i + 1, pos_j)] == HC.WALL
-            ):  # si on veut aller sur une case où il y a un garde ou un mur
-                return (
-                    False,
-                    False,
-                    1,
-                    -1,
-                )  # Pas safe et 1 pour dire qu'il y a un mur ou un garde
-
-        offsets = [
-            (2, 0, HC.GUARD_W.value - 1),
-            (3, 0, HC.GUARD_W.value - 1),
-            (1, 1, HC.GUARD_S.value - 1),
-            (1, 2, HC.GUARD_S.value - 1),
-            (1, -1, HC.GUARD_N.value - 1),
-            (1, -2, HC.GUARD_N.value - 1),
-        ]
+    # ---------- GESTION VISION POTENTIEL --------- #
 
-    elif orientation == HC.N:
-        offset_N = [(0, 2), (0, 3), (0, 4)]
-        offset_S = [(0, 0), (0, -1), (0, -2)]
-        offset_E = [(1, 1), (2, 1), (3, 1)]
-        offset_W = [(-1, 1), (-2, 1), (-3, 1)]
-        # calcul des offsets si la case où on veut aller est en haut
-        # offset_vision = [(0,2),(0,3),(0,4),(1,1),(2,1),(3,1),(-1,1),(-2,1),(-3,1),(0,0),(0,-1),(0,-2)]
+    # -- On évite notamment d'ajouter le gain potentiel de quelque chose derrière un mur (qu'on ne pourra pas voir du coup)
+    cases_vision = []
+    for ori in [HC.N, HC.S, HC.W, HC.E]:
+        for case in geo.rayons[destination][ori]:
+            if map[case] in BLOQUANTS:
+                break
+            if map[case] == 0 and case not in cases_vision:
+                cases_vision.append(case)
 
-        # On vérifie qu'on ne veut pas aller en dehors de la map
-        if pos_j + 1 >= m:
-            return False, False, 2, -1  # 2 code erreur index
+    # ---------- GESTION VISION DES GARDES --------- #
+    # La case est vue par un garde si l'une des cases d'où un garde la verrait contient ce garde
+    # et que les cases entre eux sont vides
+    gardes = gardes_en_vue(destination)
 
-        # Vérification qu'il n'y a pas de garde ni de mur sur la case où on veut aller
-        for elem in anyguard:
-            if (
-                map[(pos_i, pos_j + 1)] == elem or map[(pos_i, pos_j + 1)] == HC.WALL
-            ):  # si on veut aller sur une case où il y a un garde ou un mur
-                return (
-                    False,
-                    False,
-                    1,
-                    -1,
-                )  # Pas safe et 1 pour dire qu'il y a un mur ou un garde
-
-        offsets = [
-            (-1, 1, HC.GUARD_E.value - 1),
-            (-2, 1, HC.GUARD_E.value - 1),
-            (0, 2, HC.GUARD_S.value - 1),
-            (0, 3, HC.GUARD_S.value - 1),
-            (1, 1, HC.GUARD_W.value - 1),
-            (2, 1, HC.GUARD_W.value - 1),
-        ]
+    # Réponse directe quand les domaines des cases suffisent à trancher
+    verdict = decider_par_domaines(gardes)
+    if verdict is not None:
+        return (verdict[0], verdict[1], 0, len(cases_vision)), gardes, len(cases_vision)
 
-    elif orientation == HC.W:
-        # On vérifie qu'on ne veut pas aller en dehors de la map
-        if pos_i - 1 < 0:
-            return False, False, 2, -1  # 2 code erreur index
+    return None, gardes, len(cases_vision)
 
-        # calcul des offsets si la case où on veut aller est à gauche
-        offset_N = [(-1, 1), (-1, 2), (-1, 3)]
-        offset_S = [(-1, -1), (-1, -2), (-1, -3)]
-        offset_E = [(0, 0), (1, 0), (2, 0)]
-        offset_W = [(-2, 0), (-3, 0), (-4, 0)]
 
-        # print(offset_vision)
-        # offset_vision = [(-2,0),(-3,0),(-4,0),(-1,1),(-1,2),(-1,3),(-1,-1),(-1,-2),(-1,-3),(0,0),(1,0),(2,0)]
+# Pose un lot de demandes indépendantes (pos_i, pos_j, orientation) : les demandes de même nature
+# sont envoyées ensemble au solveur, qui peut les traiter en parallèle
+def demandes(liste_demandes, map) -> List[Tuple[bool, bool, int, int]]:
+    preparees = [preparer_demande(i, j, ori, map) for i, j, ori in liste_demandes]
+    resultats = [preparee[0] for preparee in preparees]
+    a_resoudre = [k for k, resultat in enumerate(resultats) if resultat is None]
 
-        # Vérification qu'il n'y a pas de garde ni de mur sur la case où on veut aller
-        for elem in anyguard:
-            if (
-                map[(pos_i - 1, pos_j)] == elem or map[(pos_i - 1, pos_j)] == HC.WALL
-            ):  # si on veut aller sur une case où il y a un garde ou un mur
-                return (
-                    False,
-                    False,
-                    1,
-                    -1,
-                )  # Pas safe et 1 pour dire qu'il y a un mur ou un garde
-
-        offsets = [
-            (-1, 0, HC.GUARD_W.value - 1),
-            (-2, 0, HC.GUARD_W.value - 1),
-            (-1, 1, HC.GUARD_S.value - 1),
-            (-1, 2, HC.GUARD_S.value - 1),
-            (-1, -1, HC.GUARD_N.value - 1),
-            (-1, -2, HC.GUARD_N.value - 1),
-        ]
+    # --------------- DEMANDE SAFE -----------------
+    # Si on veut demander au solveur si la case est safe, on ajoute la clause qui dit que la case est unsafe
+    # La clause n'est qu'une hypothèse de la demande : elle n'est jamais ajoutée à la base. Les cases
+    # entre garde et case n'y figurent pas : la demande est plus large, une réponse safe reste sûre.
+    results_safe = interroger_lot([[[garde for garde, _ in preparees[k][1]]] for k in a_resoudre])
 
-    elif orientation == HC.S:
-        # calcul des offsets si la case où on veut aller est en bas
-        # offset_vision = [(0,-2),(0,-3),(0,-4),(-1,-1),(-2,-1),(-3,-1),(1,-1),(2,-1),(3,-1),(0,0),(0,1),(0,2)]
-        offset_N = [(0, 0), (0, 1), (0, 2)]
-        offset_S = [(0, -2), (0, -3), (0, -4)]
-        offset_E = [(1, -1), (2, -1), (3, -1)]
-        offset_W = [(-1, -1), (-2, -1), (-3, -1)]
-
-        # offset_vision = [(0,-2),(0,-3),(0,-4),(-1,-1),(-2,-1),(-3,-1),(1,-1),(2,-1),(3,-1),(0,0),(0,1),(0,2)]
-        # On vérifie qu'on ne veut pas aller en dehors de la map
-        if pos_j - 1 < 0:
-            return False, False, 2, -1  # 2 code erreur index
-
-        # Vérification qu'il n'y a pas de garde ni de mur sur la case où on veut aller
-        for elem in anyguard:
-            if (
-                map[(pos_i, pos_j - 1)] == elem or map[(pos_i, pos_j - 1)] == HC.WALL
-            ):  # si on veut aller sur une case où il y a un garde ou un mur
-                return (
-                    False,
-                    False,
-                    1,
-                    -1,
-                )  # Pas safe et 1 pour dire qu'il y a un mur ou un garde
-
-        offsets = [
-            (-1, -1, HC.GUARD_E.value - 1),
-            (-2, -1, HC.GUARD_E.value - 1),
-            (0, -2, HC.GUARD_S.value - 1),
-            (0, -3, HC.GUARD_S.value - 1),
-            (1, -1, HC.GUARD_W.value - 1),
-            (2, -1, HC.GUARD_W.value - 1),
-        ]
+    # NE PAS DEMANDER UNSAFE SI ON A UNE REPONSE SAFE AVANT
+    a_resoudre_unsafe = []
+    for k, result_safe in zip(a_resoudre, results_safe):
+        if result_safe[0]:
+            a_resoudre_unsafe.append(k)
+        else:
+            resultats[k] = (True, False, 0, preparees[k][2])
+
+    # ---------------- DEMANDE UNSAFE -------------------
+    # On veut tester si la case n'est pas safe pour sur, c'est-à-dire que la case est dans la vision des gardes
+    # Si on veut demander au solveur si la case est unsafe, on ajoute les clauses qui disent que la case est safe :
+    # pour chaque garde, il est absent ou une case entre lui et la case n'est pas vide
+    results_unsafe = interroger_lot(
+        [[[-garde] + [-lit for lit in vides] for garde, vides in preparees[k][1]] for k in a_resoudre_unsafe]
+    )
+    for k, result_unsafe in zip(a_resoudre_unsafe, results_unsafe):
+        resultats[k] = (False, not result_unsafe[0], 0, preparees[k][2])
 
-    # ---------- GESTION VISION POTENTIEL --------- #
+    return resultats
 
-    # -- On évite notamment d'ajouter le gain potentiel de quelque chose derrière un mur (qu'on ne pourra pas voir du coup)
-    offsets_vision_orientation = [offset_N, offset_S, offset_W, offset_E]
-
-    flag1 = False
-    for type_offset in offsets_vision_orientation:
-        # print(type_offset)
-        for offset in type_offset:
-            if (0 <= offset[0] + pos_i < n) and (0 <= offset[1] + pos_j < m):
-                # print("AVANT : ", offset[0] + pos_i, offset[1] + pos_j)
-                if (
-                    map[(offset[0] + pos_i, offset[1] + pos_j)] not in blocking_items
-                    and map[(offset[0] + pos_i, offset[1] + pos_j)] == 0
-                    and offset not in offset_vision
-                ):
-                    # print("APRES : ", offset[0] + pos_i, offset[1] + pos_j)
-                    offset_vision.append(offset)
-                else:
-                    # print("APRES : ", offset[0] + pos_i, offset[1] + pos_j)
-                    if map[(offset[0] + pos_i, offset[1] + pos_j)] in blocking_items:
-                        # print("break")
-                        flag1 = True
-                        break
-    # print(offset_vision)
-    # ---------- GESTION VISION DES GARDES --------- #
-    for elem in offsets:
-        if (0 <= elem[0] + pos_i < n) and (0 <= elem[1] + pos_j < m):
-            liste_clauses_intermediaire.append(
-                cell_to_variable(elem[0] + pos_i, elem[1] + pos_j, elem[2])
-            )
 
-    liste_clauses.append(liste_clauses_intermediaire)
+# ------------- PROPAGATION SUR LES DOMAINES DES CASES -------------
+# Pour chaque case, masque des valeurs encore possibles (le bit val correspond à HC(val + 1)).
+# Tout ce qui est déduit ici découle des clauses de la base : c'est un raccourci devant le solveur.
 
-    global liste_de_clauses
-    liste_de_clauses = remove_duplicates(liste_de_clauses)
 
-    # --------------- DEMANDE SAFE -----------------
-    # Si on veut demander au solveur si la case est safe, on ajoute la liste de clauses qui dit que la case est unsafe (liste_clauses)
+def initialiser_domaines():
+    global domaines
+    domaines = {(i, j): (1 << nbVar) - 1 for i in range(n) for j in range(m)}
+
+
+# Les clauses unitaires portant sur une case (vision, écoute nulle, case de départ) restreignent son domaine
+def propager_unitaires(clauses: ClauseBase):
+    modifie = False
+    for clause in clauses:
+        if len(clause) == 1 and abs(clause[0]) <= n * m * nbVar:
+            i, j, val = variable_to_cell(abs(clause[0]))
+            ancien = domaines[(i, j)]
+            if clause[0] > 0:
+                domaines[(i, j)] = ancien & (1 << val)
+            else:
+                domaines[(i, j)] = ancien & ~(1 << val)
+            modifie = modifie or domaines[(i, j)] != ancien
+    if modifie:
+        propager_objets_uniques()
+
+
+# Il y a exactement 1 costume, 1 corde de piano et 1 cible, et un nombre connu de gardes et de
+# civils : on propage jusqu'au point fixe
+def propager_objets_uniques():
+    modifie = True
+    while modifie:
+        modifie = False
+        for masque, effectif in effectifs:
+            candidates = [case for case, domaine in domaines.items() if domaine & masque]
+            sures = [case for case in candidates if not domaines[case] & ~masque]
+            # Tous localisés : le reste de la carte n'en contient pas
+            if len(sures) == effectif and len(candidates) > effectif:
+                for case in candidates:
+                    if domaines[case] & ~masque:
+                        domaines[case] &= ~masque
+                modifie = True
+            # Autant de cases possibles que de personnes : chacune en contient une
+            elif len(candidates) == effectif and len(sures) < effectif:
+                for case in candidates:
+                    domaines[case] &= masque
+                modifie = True
+        for val in OBJETS_UNIQUES:
+            bit = 1 << val
+            candidates = [case for case, domaine in domaines.items() if domaine & bit]
+            if len(candidates) == 1 and domaines[candidates[0]] != bit:
+                domaines[candidates[0]] = bit
+                modifie = True
+            fixees = [case for case in candidates if domaines[case] == bit]
+            if fixees:
+                for case in candidates:
+                    if case != fixees[0]:
+                        domaines[case] &= ~bit
+                        modifie = True
+
+
+# Gardes qui verraient case : (littéral du garde, littéraux "case vide" des cases entre eux dont
+# on ne sait pas encore qu'elles sont vides). Comme chez l'arbitre, la vue d'un garde s'arrête à la
+# première case non vide : un garde derrière une case qui ne peut pas être vide est écarté.
+def gardes_en_vue(case) -> List[Tuple[Literal, List[Literal]]]:
+    vide = HC.EMPTY.value - 1
+    gardes = []
+    for (i, j), garde, entre in geo.portee_gardes[case]:
+        if any(not domaines[c] >> vide & 1 for c in entre):
+            continue
+        vides = [cell_to_variable(c[0], c[1], vide) for c in entre if domaines[c] != 1 << vide]
+        gardes.append((cell_to_variable(i, j, garde.value - 1), vides))
+    return gardes
+
+
+# Renvoie (safe, unsafe) si les domaines suffisent à décider si la case est vue par un garde, None sinon
+def decider_par_domaines(gardes: List[Tuple[Literal, List[Literal]]]) -> Optional[Tuple[bool, bool]]:
+    possible = False
+    for lit, vides in gardes:
+        i, j, val = variable_to_cell(lit)
+        domaine = domaines[(i, j)]
+        if domaine == 1 << val and not vides:
+            return False, True
+        if domaine >> val & 1:
+            possible = True
+    if not possible:
+        return True, False
+    return None
+
+
+# Somme de la grille sur toute fenêtre en O(1) : image intégrale (sommes préfixes 2D)
+def image_integrale(grille: List[List[int]]) -> List[List[int]]:
+    integrale = [[0] * (m + 1) for _ in range(n + 1)]
+    for i in range(n):
+        ligne = 0
+        for j in range(m):
+            ligne += grille[i][j]
+            integrale[i + 1][j + 1] = integrale[i][j + 1] + ligne
+    return integrale
+
+
+def somme_fenetre(integrale: List[List[int]], i_min, i_max, j_min, j_max) -> int:
+    return (
+        integrale[i_max + 1][j_max + 1] - integrale[i_min][j_max + 1]
+        - integrale[i_max + 1][j_min] + integrale[i_min][j_min]
+    )
+
+
+# Préfiltre arithmétique des écoutes, sans solveur. Dans la fenêtre 5x5 d'une écoute, on compte les
+# cases qui contiennent sûrement une personne (K) et celles qui peuvent en contenir une (U) :
+# si K = écoute, les cases incertaines sont sans personne ; si K + U = écoute, elles en ont toutes une.
+# Une écoute de 5 n'est qu'un minimum (l'arbitre plafonne) : seule la seconde règle s'applique alors.
+def prefiltre_ecoutes() -> ClauseBase:
+    personnes = sum(1 << val for val in range(HC.GUARD_N.value - 1, HC.CIVIL_W.value))
+    liste_clauses = []
+    modifie = True
+    while modifie:
+        modifie = False
+        sure = [[0] * m for _ in range(n)]
+        incertaine = [[0] * m for _ in range(n)]
+        for (i, j), domaine in domaines.items():
+            if domaine & personnes:
+                if domaine & ~personnes:
+                    incertaine[i][j] = 1
+                else:
+                    sure[i][j] = 1
+        integrale_sure = image_integrale(sure)
+        integrale_incertaine = image_integrale(incertaine)
+        for (pos_i, pos_j), bruit in ecoutes.items():
+            i_min, i_max, j_min, j_max = geo.bornes_ecoute[(pos_i, pos_j)]
+            nb_incertaines = somme_fenetre(integrale_incertaine, i_min, i_max, j_min, j_max)
+            if nb_incertaines == 0:
+                continue
+            nb_sures = somme_fenetre(integrale_sure, i_min, i_max, j_min, j_max)
+            if nb_sures == bruit and bruit < 5:
+                masque = ~personnes
+            elif nb_sures + nb_incertaines == bruit:
+                masque = personnes
+            else:
+                continue
+            for i in range(i_min, i_max + 1):
+                for j in range(j_min, j_max + 1):
+                    if not incertaine[i][j]:
+                        continue
+                    incertaine[i][j] = 0
+                    domaines[(i, j)] &= masque
+                    litteraux = [
+                        cell_to_variable(i, j, val)
+                        for val in range(HC.GUARD_N.value - 1, HC.CIVIL_W.value)
+                    ]
+                    if masque == personnes:
+                        liste_clauses.append(litteraux)
+                    else:
+                        liste_clauses += [[-lit] for lit in litteraux]
+            # Les comptes des autres fenêtres ont changé : on recalcule les images intégrales
+            modifie = True
+            break
     if liste_clauses:
-        liste_de_clauses += liste_clauses
+        propager_objets_uniques()
+    return liste_clauses
 
-    write_dimacs_file(clauses_to_dimacs(liste_de_clauses, nbVar_reel), "phase1.cnf")
 
-    result_safe = exec_gophersat("phase1.cnf")
+# Partie « au moins » des effectifs, restreinte aux cases qui peuvent encore contenir une personne
+# du groupe : posée quand il en reste peu, elle reste petite et force les dernières personnes
+def contraintes_effectifs() -> ClauseBase:
+    liste_clauses = []
+    for masque, effectif in effectifs:
+        candidates = [case for case, domaine in domaines.items() if domaine & masque]
+        if len(candidates) > 2 * effectif or len(candidates) >= candidates_encodees.get(masque, n * m + 1):
+            continue
+        candidates_encodees[masque] = len(candidates)
+        variables = [
+            cell_to_variable(i, j, val)
+            for i, j in candidates for val in range(nbVar) if masque >> val & 1
+        ]
+        liste_clauses += at_least_n(effectif, variables)
+    return liste_clauses
 
-    # On enlève les clauses liées à la demande safe#
-    liste_de_clauses = [
-        element for element in liste_de_clauses if element not in liste_clauses
-    ]
 
-    # NE PAS DEMANDER UNSAFE SI ON A UNE REPONSE SAFE AVANT
-    if result_safe[0]:
-        # ---------------- DEMANDE UNSAFE -------------------
-        # On veut tester si la case n'est pas safe pour sur, c'est-à-dire que la case est dans la vision des gardes
-        # Si on veut demander au solveur si la case est unsafe, on ajoute la liste de clauses qui dit que la case est safe (non liste_clauses)
-        liste_clauses_bis = []
-        for elem in liste_clauses:
-            for lit in elem:
-                liste_clauses_bis.append([-lit])
-        if liste_clauses_bis:
-            liste_de_clauses += liste_clauses_bis
-        write_dimacs_file(clauses_to_dimacs(liste_de_clauses, nbVar_reel), "phase1.cnf")
-
-        result_unsafe = exec_gophersat("phase1.cnf")
-
-        # On enlève les clauses liées à la demande unsafe
-        liste_de_clauses = [
-            element for element in liste_de_clauses if element not in liste_clauses_bis
+# Ajoute des clauses à la base de connaissances et au solveur qui reste chargé
+def ajouter_clauses(clauses: ClauseBase):
+    # Seules les clauses nouvelles (hors doublons) sont transmises au solveur
+    nouvelles = base_de_clauses.add_all(clauses)
+    modeles.filter(nouvelles)
+    propager_unitaires(nouvelles)
+    solveur.add_clauses(nouvelles)
+    if backend is not None:
+        encodeur.add(nouvelles)
+    if travailleurs is not None:
+        travailleurs.add_clauses(nouvelles)
+    simplifier_base()
+
+
+# Les cases connues (littéraux fixés au niveau 0 du solveur) sont substituées dans la base et
+# dans le solveur : les clauses satisfaites disparaissent, les littéraux faux sont retirés.
+# Seuls les littéraux fixés depuis le dernier passage sont lus ; l'encodeur DIMACS reçoit les
+# nouvelles clauses unitaires à la suite, sans re-sérialiser la base.
+def simplifier_base():
+    global marque_fixes
+    marque = solveur.fixed_mark()
+    if marque == marque_fixes:
+        return
+    nouveaux = solveur.fixed(marque_fixes)
+    marque_fixes = marque
+    if not nouveaux:
+        return
+    base_de_clauses.simplify(nouveaux)
+    solveur.simplify()
+    propager_unitaires([[lit] for lit in nouveaux])
+    if backend is not None:
+        encodeur.add([[lit] for lit in nouveaux])
+
+
+# Pose un lot de demandes (clauses temporaires) au solveur incrémental, ou au backend choisi à qui
+# on envoie toute la base par un pipe ; les demandes du lot partent ensemble dans le pool de workers
+def interroger_lot(requetes: List[ClauseBase]) -> List[Tuple[bool, List[int]]]:
+    resultats = [cache_demandes.get(requete, base_de_clauses.version) for requete in requetes]
+    # Même demande sans nouvelle clause depuis : on réutilise la réponse
+    a_resoudre = [k for k, result in enumerate(resultats) if result is None]
+    # Une demande satisfaite par un modèle déjà connu est SAT sans appel au solveur
+    for k in a_resoudre:
+        modele = modeles.find(requetes[k])
+        if modele is not None:
+            resultats[k] = (True, modele)
+    a_appeler = [k for k in a_resoudre if resultats[k] is None]
+    # Peu de cases inconnues : on énumère toutes leurs affectations plutôt que d'appeler le solveur
+    if a_appeler:
+        enumeration = enumerateur()
+        if enumeration is not None:
+            enumerateur_base, satisfaisantes = enumeration
+            for k in a_appeler:
+                masque = satisfaisantes & enumerateur_base.satisfying(requetes[k])
+                if masque:
+                    resultats[k] = (True, enumerateur_base.model((masque & -masque).bit_length() - 1))
+                else:
+                    resultats[k] = (False, [])
+            a_appeler = []
+    # Une demande seule laisserait les autres workers inactifs : on la découpe en cubes. Le backend
+    # Python résout dans des threads du même processus, les cubes n'y gagneraient rien.
+    if (
+        decoupage_cubes and len(a_appeler) == 1 and requetes[a_appeler[0]]
+        and len(base_de_clauses) >= SEUIL_CUBES
+        and (travailleurs is not None or (pool is not None and not isinstance(backend, PythonBackend)))
+    ):
+        result = resoudre_par_cubes(requetes[a_appeler[0]])
+        if result is not None:
+            resultats[a_appeler[0]] = result
+            a_appeler = []
+    if travailleurs is not None:
+        # Les workers ont déjà la base : seuls les deltas et les demandes partent
+        for k, result in zip(a_appeler, travailleurs.solve_batch([requetes[k] for k in a_appeler])):
+            if result[0]:
+                modeles.add(result[1])
+            resultats[k] = result
+    elif backend is None:
+        for k in a_appeler:
+            resultats[k] = solveur.solve_with(requetes[k])
+            if resultats[k][0]:
+                modeles.add(resultats[k][1])
+    elif decoupage_cone:
+        # Seules les composantes de la base qui touchent la demande sont envoyées ; une demande
+        # vide (recherche d'un modèle de toute la base) part en entier
+        decoupe = decoupeur()
+        sous_formules = [decoupe.slice(requetes[k]) if requetes[k] else None for k in a_appeler]
+        formules = [
+            clauses_to_dimacs(formule, nbVar_reel) if formule is not None
+            else encodeur.dimacs(requetes[k], nbVar_reel)
+            for k, formule in zip(a_appeler, sous_formules)
+        ]
+        for k, formule, result in zip(a_appeler, sous_formules, pool.solve_batch(formules)):
+            if result[0]:
+                # Le modèle d'un cône ne couvre que ses variables : il ne vaut pas pour la base
+                if formule is None:
+                    modeles.add(result[1])
+                else:
+                    result = (True, decoupe.complete(formule, result[1]))
+            resultats[k] = result
+    else:
+        for k in a_appeler:
+            base_de_clauses.push(f"demande {k}", requetes[k])
+        formules = [
+            encodeur.dimacs(base_de_clauses.group(f"demande {k}"), nbVar_reel) for k in a_appeler
+        ]
+        for k, result in zip(a_appeler, pool.solve_batch(formules)):
+            base_de_clauses.pop(f"demande {k}")
+            if result[0]:
+                modeles.add(result[1])
+            resultats[k] = result
+    for k in a_resoudre:
+        cache_demandes.put(requetes[k], base_de_clauses.version, resultats[k])
+    return resultats
+
+
+# Découpage d'une demande sur les cases de la fenêtre 5x5 des cases demandées qui peuvent encore
+# contenir un garde ou un civil, les plus contraintes (variables présentes dans le plus de clauses)
+# d'abord. Pour chaque case, une alternative par personne possible, plus « aucune personne » si la
+# case peut contenir autre chose : les alternatives d'une case s'excluent et couvrent son domaine.
+# On ajoute des cases tant que le nombre de cubes ne dépasse pas max_cubes.
+def alternatives_cube(requete: ClauseBase, max_cubes: int) -> List[List[Clause]]:
+    cases = {
+        variable_to_cell(abs(lit))[:2] for clause in requete for lit in clause if abs(lit) <= n * m * nbVar
+    }
+    candidates = {}
+    for case in cases:
+        for voisine in geo.fenetre_ecoute[case]:
+            domaine = domaines[voisine]
+            personnes = domaine & (MASQUE_GARDES | MASQUE_CIVILS)
+            # Case connue ou sans personne possible : rien à découper
+            if domaine & (domaine - 1) == 0 or not personnes:
+                continue
+            candidates[voisine] = [
+                cell_to_variable(voisine[0], voisine[1], val) for val in range(nbVar) if personnes >> val & 1
+            ]
+    ordre = sorted(
+        candidates, key=lambda case: (-sum(base_de_clauses.occurrences(var) for var in candidates[case]), case)
+    )
+    alternatives = []
+    nb_cubes = 1
+    for case in ordre:
+        variables = candidates[case]
+        choix = [[var] for var in variables]
+        if domaines[case] & ~(MASQUE_GARDES | MASQUE_CIVILS):
+            choix.append([-var for var in variables])
+        if alternatives and nb_cubes * len(choix) > max_cubes:
+            break
+        alternatives.append(choix)
+        nb_cubes *= len(choix)
+    return alternatives
+
+
+# Cube-and-conquer : environ deux cubes par worker, SAT dès qu'un cube l'est, UNSAT si tous le
+# sont. None si aucune case ne permet de découper la demande.
+def resoudre_par_cubes(requete: ClauseBase) -> Optional[Tuple[bool, List[int]]]:
+    taille = travailleurs.size if travailleurs is not None else pool.workers
+    alternatives = alternatives_cube(requete, min(16, 2 * taille))
+    if not alternatives:
+        return None
+    cubes = make_cubes(alternatives)
+    if travailleurs is not None:
+        result = travailleurs.solve_cubes(requete, cubes)
+    else:
+        result = pool.solve_any(
+            [encodeur.dimacs(requete + [[lit] for lit in cube], nbVar_reel) for cube in cubes]
+        )
+    if result[0]:
+        modeles.add(result[1])
+    return result
+
+
+# Énumérateur des cases inconnues et masque des affectations qui satisfont la base, recalculés
+# quand la base a changé ; None si les cases inconnues ont trop d'affectations possibles
+def enumerateur() -> Optional[Tuple[BruteForceEnumerator, int]]:
+    global enumeration_courante
+    if enumeration_courante is not None and enumeration_courante[0] == base_de_clauses.version:
+        return enumeration_courante[1]
+    enumeration = None
+    nb_affectations = 1
+    for domaine in domaines.values():
+        nb_affectations *= bin(domaine).count("1")
+    if 0 < nb_affectations <= SEUIL_ENUMERATION:
+        groupes = []
+        fixes = set()
+        for (i, j), domaine in domaines.items():
+            groupe = []
+            for val in range(nbVar):
+                if domaine >> val & 1:
+                    groupe.append(cell_to_variable(i, j, val))
+                else:
+                    fixes.add(-cell_to_variable(i, j, val))
+            if len(groupe) == 1:
+                fixes.add(groupe[0])
+            else:
+                groupes.append(groupe)
+        enumerateur_base = BruteForceEnumerator(groupes, fixes)
+        # Clauses sur les seules cases : les encodages à variables auxiliaires sont remplacés
+        # par l'évaluation directe des cardinalités
+        satisfaisantes = enumerateur_base.satisfying([
+            clause for clause in base_de_clauses.clauses()
+            if all(abs(lit) <= n * m * nbVar for lit in clause)
+        ])
+        for litteraux, au_moins, au_plus in cardinalites:
+            if not satisfaisantes:
+                break
+            satisfaisantes &= enumerateur_base.cardinality(litteraux, au_moins, au_plus)
+        if satisfaisantes:
+            enumeration = (enumerateur_base, satisfaisantes)
+    enumeration_courante = (base_de_clauses.version, enumeration)
+    return enumeration
+
+
+# Découpeur de la base, recalculé seulement quand la base a changé
+def decoupeur() -> ConeSlicer:
+    global decoupe_courante
+    if decoupe_courante is None or decoupe_courante[0] != base_de_clauses.version:
+        decoupe_courante = (
+            base_de_clauses.version,
+            ConeSlicer(base_de_clauses.clauses(), solveur.fixed()),
+        )
+    return decoupe_courante[1]
+
+
+def interroger(requete: ClauseBase) -> Tuple[bool, List[int]]:
+    return interroger_lot([requete])[0]
+
+
+# Littéral d'une valeur de la case différente de celle de lit, encore possible d'après son domaine
+def autre_valeur_possible(lit: Literal) -> Literal:
+    i, j, val = variable_to_cell(lit)
+    autres = domaines[(i, j)] & ~(1 << val)
+    if not autres:
+        return -lit
+    return cell_to_variable(i, j, (autres & -autres).bit_length() - 1)
+
+
+# Calcul du backbone sur les cases inconnues : une valeur vraie dans tous les modèles de la base
+# est une conséquence logique des observations, on peut l'écrire dans la carte. Le calcul n'est
+# relancé que si le solveur a fixé depuis le précédent un littéral sur une case encore inconnue
+# (les observations seules ne portent que sur des cases déjà écrites), ou si les cases inconnues
+# sont assez peu nombreuses pour être énumérées sans solveur ; force le relance dans tous les cas.
+def completer_par_backbone(map, force: bool = False):
+    global marque_backbone
+    nouveaux = solveur.fixed(marque_backbone)
+    marque_backbone = solveur.fixed_mark()
+    inconnues = map.inconnues()
+    if not inconnues:
+        return
+    touche_inconnue = any(
+        abs(lit) <= n * m * nbVar and map[variable_to_cell(abs(lit))[:2]] == 0 for lit in nouveaux
+    )
+    if not (force or touche_inconnue or enumerateur() is not None):
+        return
+
+    # Candidats : la valeur de chaque case inconnue dans un premier modèle
+    sat, modele = interroger([])
+    if not sat:
+        return
+    vrais = set(lit for lit in modele if lit > 0)
+    candidats = {}
+    for case in inconnues:
+        for val in range(nbVar):
+            if cell_to_variable(case[0], case[1], val) in vrais:
+                candidats[case] = cell_to_variable(case[0], case[1], val)
+                break
+    # Les modèles de la réserve sont des modèles de la base : ils éliminent gratuitement les
+    # candidats qu'ils contredisent
+    for vrais in modeles.recent(len(modeles)):
+        candidats = {case: lit for case, lit in candidats.items() if lit in vrais}
+
+    # Rotation de modèles : on demande un modèle où au moins un candidat change de valeur,
+    # chaque nouveau modèle élimine tous les candidats qu'il contredit. Quand il n'en existe
+    # plus, les candidats restants sont tous impliqués par la base.
+    while candidats:
+        # Le solveur est orienté vers des modèles qui contredisent le plus de candidats possible :
+        # pour chaque case on lui suggère une autre valeur encore permise par son domaine. Ce n'est
+        # qu'une indication pour le solveur en mémoire : la demande part au backend choisi comme
+        # les autres, la rotation reste correcte sans elle.
+        solveur.prefer([-lit for lit in candidats.values()])
+        solveur.prefer([autre_valeur_possible(lit) for lit in candidats.values()])
+        sat, modele = interroger([[-lit for lit in candidats.values()]])
+        if not sat:
+            break
+        vrais = set(lit for lit in modele if lit > 0)
+        candidats = {case: lit for case, lit in candidats.items() if lit in vrais}
+
+    for case, lit in candidats.items():
+        map[case] = HC(variable_to_cell(lit)[2] + 1)
+    ajouter_clauses([[lit] for lit in candidats.values()])
+    marque_backbone = solveur.fixed_mark()
+
+
+# Échantillon de modèles de la base, calculé seulement quand une case indécise doit être estimée.
+# Les modèles de la réserve ne servent pas : ceux de la rotation du backbone sont construits pour
+# contredire les candidats, ce ne sont pas des tirages indépendants. Pour chaque modèle, le solveur
+# est orienté vers une valeur tirée au hasard dans le domaine de chaque case inconnue ; les
+# personnes encore à placer sont tirées à part, sur autant de cases que l'effectif l'autorise,
+# pour ne pas contredire les cardinalités.
+def echantillonner_modeles(map) -> List[Set[int]]:
+    global echantillon_modeles
+    if echantillon_modeles[0] == base_de_clauses.version:
+        return echantillon_modeles[1]
+    hasard = random.Random(base_de_clauses.version)
+    inconnues = map.inconnues()
+    personnes = MASQUE_GARDES | MASQUE_CIVILS
+    echantillon = []
+    while len(echantillon) < NB_MODELES_ECHANTILLON:
+        choix = {}
+        for case in inconnues:
+            valeurs = [val for val in range(nbVar) if (domaines[case] & ~personnes) >> val & 1]
+            if valeurs:
+                choix[case] = hasard.choice(valeurs)
+        for masque, effectif in effectifs:
+            candidates = [case for case in inconnues if domaines[case] & masque]
+            sures = sum(1 for case, domaine in domaines.items() if domaine and not domaine & ~masque)
+            for case in hasard.sample(candidates, max(0, min(effectif - sures, len(candidates)))):
+                valeurs = [val for val in range(nbVar) if (domaines[case] & masque) >> val & 1]
+                choix[case] = hasard.choice(valeurs)
+        preferences = []
+        for (i, j), choisie in choix.items():
+            for val in range(nbVar):
+                if domaines[(i, j)] >> val & 1:
+                    lit = cell_to_variable(i, j, val)
+                    preferences.append(lit if val == choisie else -lit)
+        solveur.prefer(preferences)
+        sat, modele = solveur.solve()
+        if not sat:
+            break
+        modeles.add(modele)
+        echantillon.append(set(modele))
+    echantillon_modeles = (base_de_clauses.version, echantillon)
+    return echantillon
+
+
+# Risque estimé d'une case : 0 ou 1 quand les domaines ou une demande au solveur ont tranché, sinon
+# la part des modèles de l'échantillon où un garde la voit, lissée (règle de Laplace) : une case
+# qu'aucun modèle tiré ne montre vue n'a pas pour autant un risque nul, seule une preuve le donne.
+# Sur un civil, aucun garde ne nous voit.
+def risque_case(case, map) -> float:
+    if map[case] in [HC.CIVIL_N, HC.CIVIL_E, HC.CIVIL_S, HC.CIVIL_W]:
+        return 0.0
+    gardes = gardes_en_vue(case)
+    verdict = decider_par_domaines(gardes)
+    if verdict is not None:
+        return 0.0 if verdict[0] else 1.0
+    connu = verdicts_securite.get(case)
+    if connu is not None and connu[0] == base_de_clauses.version:
+        return connu[1]
+    echantillon = echantillonner_modeles(map)
+    if not echantillon:
+        return 0.5
+    vues = sum(
+        1 for vrais in echantillon
+        if any(lit in vrais and all(vide in vrais for vide in vides) for lit, vides in gardes)
+    )
+    return (vues + 1) / (len(echantillon) + 2)
+
+
+# Nombre de cases inconnues que l'on verrait depuis case en se tournant dans les quatre
+# orientations (la vue s'arrête à la première case connue non vide)
+def gain_vision(case, map) -> int:
+    gain = 0
+    for rayon in geo.rayons[case].values():
+        for vue in rayon:
+            if map[vue] in BLOQUANTS:
+                break
+            if map[vue] == 0:
+                gain += 1
+    return gain
+
+
+# Plus court chemin (Dijkstra) sur les états (case, orientation) à travers les cases connues
+# passables. Chaque action coûte 1, plus 5 fois le risque d'être vu par un garde après l'action.
+# Renvoie le coût et la dernière action menant à chaque état.
+def plus_courts_chemins(depart, orientation, map):
+    risques = {}
+
+    def cout(case):
+        if case not in risques:
+            risques[case] = 1 + 5 * risque_case(case, map)
+        return risques[case]
+
+    couts = {(depart, orientation): 0.0}
+    precedents = {}
+    tas = [(0.0, 0, depart, orientation)]
+    compteur = 1
+    while tas:
+        cout_etat, _, case, ori = heapq.heappop(tas)
+        if cout_etat > couts[(case, ori)]:
+            continue
+        rang = ORDRE_ORIENTATIONS.index(ori)
+        suivants = [
+            ("cw", case, ORDRE_ORIENTATIONS[(rang + 1) % 4]),
+            ("acw", case, ORDRE_ORIENTATIONS[(rang + 3) % 4]),
         ]
-        return not result_safe[0], not result_unsafe[0], 0, len(offset_vision)
+        voisin = geo.voisin[case][ori]
+        if voisin is not None and map[voisin] in PASSABLES:
+            suivants.append(("move", voisin, ori))
+        for action, case_suivante, ori_suivante in suivants:
+            nouveau = cout_etat + cout(case_suivante)
+            if nouveau < couts.get((case_suivante, ori_suivante), float("inf")):
+                couts[(case_suivante, ori_suivante)] = nouveau
+                precedents[(case_suivante, ori_suivante)] = (action, case, ori)
+                heapq.heappush(tas, (nouveau, compteur, case_suivante, ori_suivante))
+                compteur += 1
+    return couts, precedents
+
+
+# Planificateur d'exploration : parmi les cases atteignables de la frontière de vision de la carte,
+# on vise celle qui offre le plus de cases nouvelles par unité de coût. Le gain d'une case ne dépend
+# pas de l'orientation : il est calculé une fois par case de la frontière, et seul l'état le moins
+# coûteux de la case compte. Le risque estimé ne sert qu'à classer les chemins : chaque case du
+# chemin retenu que les domaines ne tranchent pas, et qui n'a pas de verdict pour la version
+# courante de la base, est vérifiée au solveur (en un lot). Si cela change son risque, on replanifie.
+# Renvoie les actions jusqu'à la case visée, None s'il n'y a plus rien à découvrir.
+def planifier_exploration(status, map) -> Optional[List[str]]:
+    depart = status["position"]
+    gains = {case: gain_vision(case, map) for case in map.frontiere if case != depart}
+    gains = {case: gain for case, gain in gains.items() if gain}
+    for _ in range(3):
+        couts, precedents = plus_courts_chemins(depart, status["orientation"], map)
+        meilleur = None
+        for case, gain in gains.items():
+            etats = [(case, ori) for ori in ORDRE_ORIENTATIONS if (case, ori) in couts]
+            if not etats:
+                continue
+            _, ori = min(etats, key=couts.get)
+            cout = couts[(case, ori)]
+            # À rapport égal, la cible la moins coûteuse (la plus proche)
+            if meilleur is None or (gain / (1 + cout), -cout) > meilleur[0]:
+                meilleur = ((gain / (1 + cout), -cout), case, ori)
+        if meilleur is None:
+            return None
+
+        actions = []
+        etat = (meilleur[1], meilleur[2])
+        pas = []
+        while etat in precedents:
+            action, case, ori = precedents[etat]
+            actions.append(action)
+            if action == "move":
+                pas.append((case[0], case[1], ori))
+            etat = (case, ori)
+        actions.reverse()
+
+        # Seuls les pas du chemin retenu coûtent des demandes au solveur
+        a_verifier = []
+        for pas_chemin in pas:
+            destination = geo.voisin[pas_chemin[:2]][pas_chemin[2]]
+            if verdicts_securite.get(destination, (-1,))[0] == base_de_clauses.version:
+                continue
+            if map[destination] in [HC.CIVIL_N, HC.CIVIL_E, HC.CIVIL_S, HC.CIVIL_W]:
+                continue
+            if decider_par_domaines(gardes_en_vue(destination)) is not None:
+                continue
+            a_verifier.append(pas_chemin)
+        if not a_verifier:
+            return actions
+        for (i, j, ori), resultat in zip(a_verifier, demandes(a_verifier, map)):
+            destination = geo.voisin[(i, j)][ori]
+            if resultat[0]:
+                risque = 0.0
+            elif resultat[1]:
+                risque = 1.0
+            else:
+                risque = risque_case(destination, map)
+            verdicts_securite[destination] = (base_de_clauses.version, risque)
+    return actions
 
-    return not result_safe[0], False, 0, len(offset_vision)
 
+# Complète les cases restées inconnues (inobservables) avec leur valeur dans un modèle de la base
+def completer_par_modele(map):
+    sat, modele = interroger([])
+    if not sat:
+        return
+    vrais = set(lit for lit in modele if lit > 0)
+    for case in map.inconnues():
+        for val in range(nbVar):
+            if cell_to_variable(case[0], case[1], val) in vrais:
+                map[case] = HC(val + 1)
+                break
 
-def solver_phase1(status, map):
-    global liste_de_clauses
-    liste_de_clauses = initialize_regles(status, map)
 
-    while any(value == 0 for value in map.values()):
-        has_moved = False
+def solver_phase1(status, map):
+    global base_de_clauses, solveur, backend, pool, travailleurs, encodeur, cache_demandes, ecoutes, marque_backbone, decoupe_courante
+    global marque_fixes, modeles, echantillon_modeles, effectifs, candidates_encodees
+    global cardinalites, enumeration_courante, geo, verdicts_securite
+    verdicts_securite = {}
+    geo = geometrie(n, m)
+    base_de_clauses = ClauseStore()
+    cardinalites = []
+    enumeration_courante = None
+    candidates_encodees = {}
+    effectifs = [(MASQUE_GARDES, status["guard_count"]), (MASQUE_CIVILS, status["civil_count"])]
+    echantillon_modeles = (-1, [])
+    modeles = ModelPool()
+    marque_fixes = 0
+    cache_demandes = QueryCache()
+    ecoutes = {}
+    marque_backbone = 0
+    solveur = IncrementalSolver(nbVar_reel)
+    travailleurs = WorkerPool() if backend_sat == "workers" else None
+    backend = get_backend(backend_sat) if backend_sat and not travailleurs else None
+    pool = SolverPool(backend) if backend else None
+    encodeur = DimacsEncoder()
+    decoupe_courante = None
+    initialiser_domaines()
+    ajouter_clauses(initialize_regles(status, map))
+
+    while map.nb_inconnues:
         clauses_bruit = gestion_bruit(status)
-        liste_de_clauses += clauses_bruit
+        ajouter_clauses(clauses_bruit)
 
         orientations = [HC.N, HC.S, HC.W, HC.E]
         orientation = status["orientation"]
@@ -412,65 +1113,19 @@ def solver_phase1(status, map):
         j = status["position"][1]
 
         # On sauvegarde les orientations qui peuvent nous donner des infos nouvelles grâce à la vision
-        # Ne gère pas les cas où la vision est stoppée par un objet/personne
+        # La vision s'arrête à la première case connue non vide (BLOQUANTS)
         orientations_to_check = []
-        blocking_items = [
-            HC.CIVIL_N,
-            HC.CIVIL_S,
-            HC.CIVIL_E,
-            HC.CIVIL_W,
-            HC.WALL,
-            HC.GUARD_N,
-            HC.GUARD_S,
-            HC.GUARD_E,
-            HC.GUARD_W,
-            HC.SUIT,
-        ]
 
         for ori in orientations:
             cpt = 0
-            if ori == HC.N:
-                for x in range(1, 4):
-                    if 0 <= j + x < m:
-                        if map[(i, j + x)] == 0:
-                            cpt += 1
-                        if map[(i, j + x)] in blocking_items:
-                            break
-            elif ori == HC.E:
-                for x in range(1, 4):
-                    if 0 <= i + x < n:
-                        if map[(i + x, j)] in blocking_items:
-                            break
-                        elif map[(i + x, j)] == 0:
-                            cpt += 1
-            elif ori == HC.W:
-                for x in range(-1, -4, -1):
-                    if 0 <= i + x < n:
-                        if map[(i + x, j)] in blocking_items:
-                            break
-                        elif map[(i + x, j)] == 0:
-                            cpt += 1
-            elif ori == HC.S:
-                for x in range(-1, -4, -1):
-                    if 0 <= j + x < m:
-                        if map[(i, j + x)] in blocking_items:
-                            break
-                        if map[(i, j + x)] == 0:
-                            cpt += 1
+            for case in geo.rayons[(i, j)][ori]:
+                if map[case] in BLOQUANTS:
+                    break
+                if map[case] == 0:
+                    cpt += 1
             if cpt > 0:
                 orientations_to_check.append(ori)
 
-        # On conserve l'orientation qui permettra de savoir de là d'où il vient; ex: s'il se déplace vers le nord c'est qu'il vient du sud
-        # Sauf au début mais ça n'a aucun impact de le garder donc aucun problème
-        if orientation == HC.N:
-            orientation_origine = HC.S
-        elif orientation == HC.S:
-            orientation_origine = HC.N
-        elif orientation == HC.W:
-            orientation_origine = HC.E
-        else:
-            orientation_origine = HC.W
-
         # On ne se tourne que vers les destinations intéressantes à observer
         for ori in orientations_to_check:
             if orientation == HC.N:
@@ -511,7 +1166,7 @@ def solver_phase1(status, map):
 
             clauses_vision = gestion_vision(status)
 
-            liste_de_clauses += clauses_vision
+            ajouter_clauses(clauses_vision)
 
             for elem in clauses_vision:
                 variable = variable_to_cell(elem[0])
@@ -522,245 +1177,34 @@ def solver_phase1(status, map):
 
             orientation = status["orientation"]
 
-        i = status["position"][0]
-        j = status["position"][1]
-        afficher_grille(m, n, map, status)
+        # Les écoutes tranchent à elles seules une partie des cases, avant toute demande au solveur
+        ajouter_clauses(prefiltre_ecoutes())
+        ajouter_clauses(contraintes_effectifs())
+        # Les cases déjà imposées par la base sont écrites dans la carte sans aller les voir
+        completer_par_backbone(map)
+        if not map.nb_inconnues:
+            break
 
-        # Gestion déplacement
-
-        # On récupère les directions possibles à partir de notre position
-        dest = []
-        for ori in orientations:
-            ret = demande(i, j, ori, map)
-            if ret[2] == 0:
-                dest.append((ret[0], ret[1], ori, ret[3]))
-
-        # S'il y a plusieurs destinations possibles, on enlève celle d'où on vient
-        if len(dest) > 1:
-            for destination in dest:
-                if destination[2] == orientation_origine:
-                    dest.remove(destination)
-
-        # on met la meilleure en premier (au sens du nombre de cases à découvrir)
-        # tri_selon_potentiel = dest.sort(key=lambda x: x[3], reverse=True)
-        tri_selon_potentiel = sorted(dest, key=lambda x: x[3], reverse=True)
-        tri_selon_unsafe = sorted(
-            tri_selon_potentiel, key=lambda x: not x[1], reverse=True
-        )
-        #print(tri_selon_unsafe)
-        # Si toutes les orientations de tri_selon_unsafe ont un potentiel de vision =
-        # Et qu'elles ne se distinguent pas par le caractère "safe" de la case
-        # Alors on lance une demande de safe sur la case située 1 case plus loin
-        nb_orientations = len(tri_selon_unsafe)
-        second_tab = []
-        indecision = False
-        # Cas où y'aurait une indécision si on enlevait l'orientation qui est sure d'être pas safe (car avant on rentrait pas dans la boucle d'indécision)
-        at_least_one_not_unsafe = False
-        for orientations in tri_selon_unsafe:
-            if not orientations[1]:
-                at_least_one_not_unsafe = True
+        afficher_grille(m, n, map, status)
 
-        if (
-            nb_orientations > 1 and at_least_one_not_unsafe
-        ):  # si on est pas dans un cas ou on est contraints
-            for orientations in tri_selon_unsafe.copy():
-                if orientations[
-                    1
-                ]:  # si l'orientaaiton est forcément unsafe on la dégage
-                    tri_selon_unsafe.remove(orientations)
-        #print(tri_selon_unsafe)
-        nb_orientations = len(tri_selon_unsafe)
-        if (
-            nb_orientations == 2
-            and tri_selon_unsafe[0][3] == tri_selon_unsafe[1][3]
-            and tri_selon_unsafe[0][0]
-            and tri_selon_unsafe[1][0]
-        ) or (
-            nb_orientations == 2
-            and tri_selon_unsafe[0][3] == tri_selon_unsafe[1][3] == 0
-        ):
-            indecision = True
-            for iter in range(nb_orientations):
-                if tri_selon_unsafe[iter][2] == HC.N:
-                    #print(demande(i, j + 1, HC.N, map))
-                    potentiel = demande(i, j + 1, HC.N, map)[3]
-                    second_tab.append((HC.N, potentiel))
-                elif tri_selon_unsafe[iter][2] == HC.S:
-                    #print(demande(i, j - 1, HC.S, map))
-                    potentiel = demande(i, j - 1, HC.S, map)[3]
-                    second_tab.append((HC.S, potentiel))
-                elif tri_selon_unsafe[iter][2] == HC.W:
-                    #print(demande(i - 1, j, HC.W, map))
-                    potentiel = demande(i - 1, j, HC.W, map)[3]
-                    second_tab.append((HC.W, potentiel))
-                else:
-                    #print(demande(i + 1, j, HC.E, map))
-                    potentiel = demande(i + 1, j, HC.E, map)[3]
-                    second_tab.append((HC.E, potentiel))
-        elif (
-            nb_orientations == 3
-            and tri_selon_unsafe[0][3] == tri_selon_unsafe[1][3]
-            and tri_selon_unsafe[1][3] == tri_selon_unsafe[2][3]
-            and tri_selon_unsafe[0][0]
-            and tri_selon_unsafe[1][0]
-            and tri_selon_unsafe[2][0]
-        ) or (
-            nb_orientations == 3
-            and tri_selon_unsafe[0][3]
-            == tri_selon_unsafe[1][3]
-            == tri_selon_unsafe[2][3]
-            == 0
-        ):
-            indecision = True
-            for iter in range(nb_orientations):
-                if tri_selon_unsafe[iter][2] == HC.N:
-                    potentiel = demande(i, j + 1, HC.N, map)[3]
-                    second_tab.append((HC.N, potentiel))
-                elif tri_selon_unsafe[iter][2] == HC.S:
-                    potentiel = demande(i, j - 1, HC.S, map)[3]
-                    second_tab.append((HC.S, potentiel))
-                elif tri_selon_unsafe[iter][2] == HC.W:
-                    potentiel = demande(i - 1, j, HC.W, map)[3]
-                    second_tab.append((HC.W, potentiel))
-                else:
-                    potentiel = demande(i + 1, j, HC.E, map)[3]
-                    second_tab.append((HC.E, potentiel))
-        elif (
-            nb_orientations == 4
-            and tri_selon_unsafe[0][3] == tri_selon_unsafe[1][3]
-            and tri_selon_unsafe[1][3] == tri_selon_unsafe[2][3]
-            and tri_selon_unsafe[2][3] == tri_selon_unsafe[3][3]
-            and tri_selon_unsafe[0][0]
-            and tri_selon_unsafe[1][0]
-            and tri_selon_unsafe[2][0]
-            and tri_selon_unsafe[3][0]
-        ) or (
-            nb_orientations == 4
-            and tri_selon_unsafe[0][3]
-            == tri_selon_unsafe[1][3]
-            == tri_selon_unsafe[2][3]
-            == tri_selon_unsafe[3][3]
-            == 0
-        ):
-            indecision = True
-            for iter in range(nb_orientations):
-                if tri_selon_unsafe[iter][2] == HC.N:
-                    potentiel = demande(i, j + 1, HC.N, map)[3]
-                    second_tab.append((HC.N, potentiel))
-                elif tri_selon_unsafe[iter][2] == HC.S:
-                    potentiel = demande(i, j - 1, HC.S, map)[3]
-                    second_tab.append((HC.S, potentiel))
-                elif tri_selon_unsafe[iter][2] == HC.W:
-                    potentiel = demande(i - 1, j, HC.W, map)[3]
-                    second_tab.append((HC.W, potentiel))
-                else:
-                    potentiel = demande(i + 1, j, HC.E, map)[3]
-                    second_tab.append((HC.E, potentiel))
-
-        if indecision:
-            # On trie second_tab selon le potentiel
-            second_tab = sorted(second_tab, key=lambda x: x[1], reverse=True)
-            #print(second_tab)
-            orientation_gagnante = second_tab[0][0]
-
-            copy = tri_selon_unsafe[:]
-            for elem in copy:
-                if elem[2] == orientation_gagnante:
-                    tri_selon_unsafe.remove(elem)
-                    tri_selon_unsafe.insert(0, elem)
-                    break  # On a trouvé l'orientation gagnante, on peut sortir de la boucle
-
-        for couple_safe_ori in tri_selon_unsafe:
-            # Si la destination est safe, on se tourne dans la bonne direction et on bouge. Dans le cas où il y a une
-            # destination safe et une possible mais pas forcément safe (au moins), on peut favoriser celle qui n'est pas forcément
-            # safe si on est sur de découvrir 0 case en allant sur la safe (en gros selon la situation, on privilégie celle qui
-            # nous donnera le plus d'infos utiles
-
-            # Si la destination est safe et qu'elle a un potentiel au moins supérieur à 1 ou alors elle est unique, alors on la privilégie.
-            if couple_safe_ori[0] and (
-                couple_safe_ori[3] > 1 or len(tri_selon_unsafe) <= 1
-            ):
-                if (
-                    orientation == couple_safe_ori[2]
-                ):  # Si on est déjà dans la bonne direction
-                    status = hr.move()
-                    has_moved = True
-                else:  # Sinon on se tourne dans la bonne direction
-                    if orientation == HC.N:
-                        if couple_safe_ori[2] == HC.E:
-                            status = hr.turn_clockwise()
-                        elif couple_safe_ori[2] == HC.W:
-                            status = hr.turn_anti_clockwise()
-                        else:
-                            status = hr.turn_clockwise()
-                            status = hr.turn_clockwise()
-                    elif orientation == HC.S:
-                        if couple_safe_ori[2] == HC.E:
-                            status = hr.turn_anti_clockwise()
-                        elif couple_safe_ori[2] == HC.W:
-                            status = hr.turn_clockwise()
-                        else:
-                            status = hr.turn_clockwise()
-                            status = hr.turn_clockwise()
-                    elif orientation == HC.E:
-                        if couple_safe_ori[2] == HC.N:
-                            status = hr.turn_anti_clockwise()
-                        elif couple_safe_ori[2] == HC.S:
-                            status = hr.turn_clockwise()
-                        else:
-                            status = hr.turn_clockwise()
-                            status = hr.turn_clockwise()
-                    elif orientation == HC.W:
-                        if couple_safe_ori[2] == HC.N:
-                            status = hr.turn_clockwise()
-                        elif couple_safe_ori[2] == HC.S:
-                            status = hr.turn_anti_clockwise()
-                        else:
-                            status = hr.turn_clockwise()
-                            status = hr.turn_clockwise()
-                    status = hr.move()
-                    has_moved = True
-        #print(tri_selon_unsafe)
-        # Sinon, on prend la premiere orientation (celle qui a été ajoutée au dessus)
-        if not has_moved:
-            # on prend la première destination possible
-            best_ori = tri_selon_unsafe[0][2]
-            if orientation == best_ori:
-                status = hr.move()
-            else:
-                if orientation == HC.N:
-                    if best_ori == HC.E:
-                        status = hr.turn_clockwise()
-                    elif best_ori == HC.W:
-                        status = hr.turn_anti_clockwise()
-                    else:
-                        status = hr.turn_clockwise()
-                        status = hr.turn_clockwise()
-                elif orientation == HC.S:
-                    if best_ori == HC.E:
-                        status = hr.turn_anti_clockwise()
-                    elif best_ori == HC.W:
-                        status = hr.turn_clockwise()
-                    else:
-                        status = hr.turn_clockwise()
-                        status = hr.turn_clockwise()
-                elif orientation == HC.E:
-                    if best_ori == HC.N:
-                        status = hr.turn_anti_clockwise()
-                    elif best_ori == HC.S:
-                        status = hr.turn_clockwise()
-                    else:
-                        status = hr.turn_clockwise()
-                        status = hr.turn_clockwise()
-                elif orientation == HC.W:
-                    if best_ori == HC.N:
-                        status = hr.turn_clockwise()
-                    elif best_ori == HC.S:
-                        status = hr.turn_anti_clockwise()
-                    else:
-                        status = hr.turn_clockwise()
-                        status = hr.turn_clockwise()
+        # Gestion déplacement : le planificateur choisit une case de la frontière et le chemin
+        # pour y aller, on n'exécute que les actions jusqu'au premier pas puis on observe à nouveau
+        actions = planifier_exploration(status, map)
+        if actions is None:
+            # Plus aucune case inconnue n'est observable : on écrit ce que la base impose, puis on
+            # complète le reste avec un modèle de la base
+            completer_par_backbone(map, force=True)
+            completer_par_modele(map)
+            break
+        for action in actions:
+            if action == "move":
                 status = hr.move()
+                break
+            status = hr.turn_clockwise() if action == "cw" else hr.turn_anti_clockwise()
+    if pool is not None:
+        pool.close()
+    if travailleurs is not None:
+        travailleurs.close()
     #print(f"Pénalités obtenues phase 1: {status['penalties']}")
     print("\n\n")
 
@@ -809,9 +1253,9 @@ def afficher_grille(nb_lignes, nb_colonnes, dictionnaire, status):
     )  # Afficher la ligne de délimitation horizontale en bas de la grille
 
 
-def set_empty_map() -> Dict:
-    # Si on fait une map comme dans l'arbitre
-    map = {(i, j): 0 for i in range(n) for j in range(m)}
+def set_empty_map() -> CarteConnaissance:
+    # Même indexation que l'arbitre ({(i, j): contenu}), 0 pour une case inconnue
+    map = CarteConnaissance(n, m)
     return map
 
 
@@ -2015,12 +2459,12 @@ def main():
     global m, n, nbVar, nbVar_reel
     m = status["m"]
     n = status["n"]
-    nbVar = len(HC)
+    nbVar = len(VALEURS_CASE)
     nbVar_reel = m * n * nbVar
     #print(status)
     map = set_empty_map()
     solver_phase1(status, map)
-    pprint(hr.send_content(map))
+    pprint(hr.send_content(map.to_dict()))
     _, score, history, true_map = hr.end_phase1()
     print(score)
     time.sleep(10)
@@ -2040,4 +2484,9 @@ def main():
 
 
 if __name__ == "__main__":
+    if sys.argv[1:] == ["--check"]:
+        # Solveur, ClauseStore et encodages confrontés à la force brute
+        nb_erreurs = self_check() + verifier_encodages()
+        print(f"{nb_erreurs} écart(s)")
+        sys.exit(1 if nb_erreurs else 0)
     main()
@@ -1,12 +1,45 @@
+import atexit
+import heapq
+import itertools
+import os
+import random
+import shutil
+import signal
 import subprocess
-from typing import List, Dict, Generator, Tuple
+import sys
+import tempfile
+import threading
+import time
+from array import array
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from typing import Callable, List, Dict, FrozenSet, Generator, Iterator, Optional, Set, Tuple
+
+def clauses_to_text(clauses) -> str:
+    return "".join([" ".join([str(i) for i in clause]) + " 0\n" for clause in clauses])
+
 
 def clauses_to_dimacs(clauses, nb_var):
     nb_clause = len(clauses)
-    chaine = f"p cnf {nb_var} {nb_clause}\n"
-    for clause in clauses:
-        chaine += " ".join([str(i) for i in clause]) + " 0\n"
-    return chaine
+    return f"p cnf {nb_var} {nb_clause}\n" + clauses_to_text(clauses)
+
+
+# Encodeur DIMACS incrémental : les clauses de la base (règles puis observations) ne sont
+# sérialisées qu'une fois, à leur ajout ; chaque demande n'encode que ses propres clauses
+# et l'en-tête est recalculé à partir des compteurs.
+class DimacsEncoder:
+    def __init__(self, clauses: List[List[int]] = ()):
+        self._texte = ""
+        self.nb_clauses = 0
+        self.add(clauses)
+
+    def add(self, clauses: List[List[int]]):
+        if clauses:
+            self._texte += clauses_to_text(clauses)
+            self.nb_clauses += len(clauses)
+
+    def dimacs(self, delta: List[List[int]], nb_var: int) -> str:
+        header = f"p cnf {nb_var} {self.nb_clauses + len(delta)}\n"
+        return header + self._texte + clauses_to_text(delta)
 
 
 def write_dimacs_file(dimacs: str, filename: str):
@@ -25,3 +58,1553 @@ def exec_gophersat(filename: str, cmd: str = "gophersat", encoding: str = "utf8"
     model = lines[2][2:-2].split(" ")
 
     return True, [int(x) for x in model]
+
+
+# Tableau de clauses compact (format CSR) : tous les littéraux dans un seul array d'int32, chaque
+# clause suivie de son 0 comme en DIMACS, et un array des positions de début de clause. Une clause
+# supprimée est marquée morte dans _vivantes ; ClauseStore recompacte quand les mortes dominent.
+class ClauseArray:
+    def __init__(self, clauses: List[List[int]] = ()):
+        self._litteraux = array("i")
+        self._debuts = array("q")
+        self._vivantes = bytearray()
+        self.nb_removed = 0
+        for clause in clauses:
+            self.append(clause)
+
+    def append(self, clause) -> int:
+        self._debuts.append(len(self._litteraux))
+        self._litteraux.extend(clause)
+        self._litteraux.append(0)
+        self._vivantes.append(1)
+        return len(self._debuts) - 1
+
+    def _bornes(self, index: int) -> Tuple[int, int]:
+        debut = self._debuts[index]
+        if index + 1 < len(self._debuts):
+            return debut, self._debuts[index + 1] - 1
+        return debut, len(self._litteraux) - 1
+
+    def __getitem__(self, index: int) -> List[int]:
+        debut, fin = self._bornes(index)
+        return self._litteraux[debut:fin].tolist()
+
+    def equals(self, index: int, clause) -> bool:
+        debut, fin = self._bornes(index)
+        return self._vivantes[index] == 1 and self._litteraux[debut:fin] == array("i", clause)
+
+    def alive(self, index: int) -> bool:
+        return self._vivantes[index] == 1
+
+    def remove(self, index: int):
+        if self._vivantes[index]:
+            self._vivantes[index] = 0
+            self.nb_removed += 1
+
+    # Un seul tolist() pour tout le tableau, puis des tranches de liste : bien moins d'appels
+    # qu'un tolist() par clause
+    def __iter__(self) -> Iterator[List[int]]:
+        litteraux = self._litteraux.tolist()
+        debuts = self._debuts
+        for index, vivante in enumerate(self._vivantes):
+            if vivante:
+                fin = debuts[index + 1] - 1 if index + 1 < len(debuts) else len(litteraux) - 1
+                yield litteraux[debuts[index]:fin]
+
+    def __len__(self) -> int:
+        return len(self._debuts) - self.nb_removed
+
+
+# Base de clauses : les doublons sont rejetés en O(1) à l'insertion (clé de hachage sur la
+# clause triée), les clauses temporaires vont dans des groupes nommés qu'on empile et dépile
+# en O(taille du groupe), et la version n'augmente que quand la base grossit réellement.
+# Les littéraux connus (clauses unitaires) simplifient la base au fur et à mesure : les clauses
+# satisfaites disparaissent et les littéraux faux sont retirés. Les clauses sont rangées à plat
+# dans un ClauseArray ; la liste rendue par clauses() est gardée tant que la base ne change pas.
+class ClauseStore:
+    def __init__(self, clauses: List[List[int]] = ()):
+        self._clauses = ClauseArray()
+        # Index de dédoublonnage : hash de la clause triée -> indice ; les rares collisions de hash
+        # entre clauses différentes vont dans _collisions
+        self._index: Dict[int, int] = {}
+        self._collisions: Dict[Tuple[int, ...], int] = {}
+        self._occurrences: Dict[int, array] = {}
+        self._fixes: Set[int] = set()
+        self._groupes: Dict[str, List[List[int]]] = {}
+        self._liste: Optional[List[List[int]]] = None
+        self.version = 0
+        self.add_all(clauses)
+
+    @staticmethod
+    def _cle(clause: List[int]) -> Tuple[int, ...]:
+        return tuple(sorted(set(clause)))
+
+    # None si la clause est satisfaite par un littéral connu, sinon la clause sans ses littéraux faux
+    def _simplifier(self, clause: List[int]) -> Optional[List[int]]:
+        simplifiee = []
+        for lit in clause:
+            if lit in self._fixes:
+                return None
+            if -lit not in self._fixes:
+                simplifiee.append(lit)
+        return simplifiee
+
+    def _trouver(self, cle: Tuple[int, ...]) -> Optional[int]:
+        index = self._index.get(hash(cle))
+        if index is not None and self._clauses.equals(index, cle):
+            return index
+        return self._collisions.get(cle)
+
+    def _enregistrer(self, cle: Tuple[int, ...]) -> bool:
+        if self._trouver(cle) is not None:
+            return False
+        index = self._clauses.append(cle)
+        self._liste = None
+        if hash(cle) in self._index:
+            self._collisions[cle] = index
+        else:
+            self._index[hash(cle)] = index
+        for lit in cle:
+            occurrences = self._occurrences.get(abs(lit))
+            if occurrences is None:
+                occurrences = self._occurrences[abs(lit)] = array("i")
+            occurrences.append(index)
+        return True
+
+    def _supprimer(self, index: int):
+        cle = tuple(self._clauses[index])
+        if self._index.get(hash(cle)) == index:
+            del self._index[hash(cle)]
+        else:
+            del self._collisions[cle]
+        self._clauses.remove(index)
+        self._liste = None
+
+    def add(self, clause: List[int]) -> Optional[List[int]]:
+        clause = self._simplifier(clause)
+        if clause is None:
+            return None
+        cle = self._cle(clause)
+        if len(cle) == 1:
+            if not self.simplify(cle):
+                return None
+        elif not self._enregistrer(cle):
+            return None
+        self.version += 1
+        return list(cle)
+
+    # Renvoie les clauses réellement ajoutées, une fois simplifiées
+    def add_all(self, clauses: List[List[int]]) -> List[List[int]]:
+        ajoutees = []
+        for clause in clauses:
+            clause = self.add(clause)
+            if clause is not None:
+                ajoutees.append(clause)
+        return ajoutees
+
+    # Propage des littéraux connus dans la base, en ne visitant que les clauses où ils apparaissent.
+    # Renvoie les littéraux nouvellement fixés, y compris ceux des clauses devenues unitaires.
+    def simplify(self, literals: List[int]) -> List[int]:
+        nouveaux = []
+        a_traiter = [lit for lit in literals if lit not in self._fixes]
+        while a_traiter:
+            lit = a_traiter.pop()
+            if lit in self._fixes:
+                continue
+            self._fixes.add(lit)
+            self._liste = None
+            nouveaux.append(lit)
+            for index in self._occurrences.pop(abs(lit), ()):
+                if not self._clauses.alive(index):
+                    continue
+                clause = self._clauses[index]
+                self._supprimer(index)
+                if lit in clause:
+                    continue
+                clause.remove(-lit)
+                if len(clause) == 1:
+                    a_traiter.append(clause[0])
+                else:
+                    self._enregistrer(tuple(clause))
+        if self._clauses.nb_removed > len(self._clauses):
+            self._compacter()
+        return nouveaux
+
+    def _compacter(self):
+        clauses = list(self._clauses)
+        self._clauses = ClauseArray()
+        self._index = {}
+        self._collisions = {}
+        self._occurrences = {}
+        for clause in clauses:
+            self._enregistrer(tuple(clause))
+
+    def push(self, name: str, clauses: List[List[int]]):
+        if name in self._groupes:
+            raise ValueError(f"Groupe de clauses {name} déjà présent")
+        self._groupes[name] = [list(clause) for clause in clauses]
+
+    def pop(self, name: str) -> List[List[int]]:
+        return self._groupes.pop(name)
+
+    def group(self, name: str) -> List[List[int]]:
+        return self._groupes[name]
+
+    def groups(self) -> List[List[int]]:
+        return [clause for groupe in self._groupes.values() for clause in groupe]
+
+    # Base complète : les littéraux connus sous forme de clauses unitaires, puis les autres clauses.
+    # Les clauses sont partagées entre les appels : à lire seulement.
+    def clauses(self) -> List[List[int]]:
+        if self._liste is None:
+            self._liste = [[lit] for lit in self._fixes] + list(self._clauses)
+        return list(self._liste)
+
+    # Nombre de clauses où la variable apparaît (clauses supprimées depuis le dernier compactage comprises)
+    def occurrences(self, var: int) -> int:
+        return len(self._occurrences.get(var, ()))
+
+    # Nombre de clauses de la base, hors groupes
+    def nb_base(self) -> int:
+        return len(self._fixes) + len(self._clauses)
+
+    def __contains__(self, clause: List[int]) -> bool:
+        cle = self._cle(clause)
+        return self._trouver(cle) is not None or (len(cle) == 1 and cle[0] in self._fixes)
+
+    def __iter__(self) -> Iterator[List[int]]:
+        yield from self.clauses()
+        for groupe in self._groupes.values():
+            yield from groupe
+
+    def __len__(self) -> int:
+        return self.nb_base() + sum(len(groupe) for groupe in self._groupes.values())
+
+
+# Mémoïsation des demandes, indexée par l'ensemble de leurs clauses. Quand la version de la
+# base change, les réponses SAT sont oubliées ; les réponses UNSAT restent vraies puisque
+# la base ne fait que grossir.
+class QueryCache:
+    def __init__(self):
+        self._version = -1
+        self._resultats: Dict[FrozenSet[Tuple[int, ...]], Tuple[bool, List[int]]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _cle(requete: List[List[int]]) -> FrozenSet[Tuple[int, ...]]:
+        return frozenset(tuple(sorted(set(clause))) for clause in requete)
+
+    def _synchroniser(self, version: int):
+        if version != self._version:
+            self._resultats = {
+                cle: resultat for cle, resultat in self._resultats.items() if not resultat[0]
+            }
+            self._version = version
+
+    def get(self, requete: List[List[int]], version: int) -> Optional[Tuple[bool, List[int]]]:
+        self._synchroniser(version)
+        resultat = self._resultats.get(self._cle(requete))
+        if resultat is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return resultat
+
+    def put(self, requete: List[List[int]], version: int, resultat: Tuple[bool, List[int]]):
+        self._synchroniser(version)
+        self._resultats[self._cle(requete)] = resultat
+
+
+# Réserve des derniers modèles complets de la base. Une demande satisfaite par l'un d'eux est
+# SAT sans appeler le solveur ; un modèle qui viole une clause ajoutée depuis est retiré.
+class ModelPool:
+    def __init__(self, size: int = 16):
+        self.size = size
+        self._modeles: List[Tuple[List[int], Set[int]]] = []
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _satisfait(vrais: Set[int], clauses: List[List[int]]) -> bool:
+        return all(any(lit in vrais for lit in clause) for clause in clauses)
+
+    def add(self, model: List[int]):
+        self._modeles.insert(0, (model, set(model)))
+        del self._modeles[self.size:]
+
+    def find(self, clauses: List[List[int]]) -> Optional[List[int]]:
+        for k, (modele, vrais) in enumerate(self._modeles):
+            if self._satisfait(vrais, clauses):
+                # Le modèle utile repasse en tête : les moins utiles sortent en premier
+                self._modeles.insert(0, self._modeles.pop(k))
+                self.hits += 1
+                return modele
+        self.misses += 1
+        return None
+
+    # Ensembles de littéraux vrais des k modèles les plus récents
+    def recent(self, k: int) -> List[Set[int]]:
+        return [vrais for _, vrais in self._modeles[:k]]
+
+    def filter(self, clauses: List[List[int]]):
+        self._modeles = [
+            (modele, vrais) for modele, vrais in self._modeles if self._satisfait(vrais, clauses)
+        ]
+
+    def __len__(self) -> int:
+        return len(self._modeles)
+
+
+# Découpage par cône d'influence. Les littéraux fixés (impliqués par la base) simplifient les
+# clauses, puis les clauses restantes sont regroupées en composantes connexes par variables
+# partagées. Si la base est satisfiable, chaque composante l'est indépendamment des autres :
+# pour une demande, seules les composantes qui touchent ses variables sont nécessaires.
+# Les règles globales (exactement un costume, ...) relient tout tant que leurs cases ne sont pas fixées.
+class ConeSlicer:
+    def __init__(self, clauses: List[List[int]], fixed: List[int]):
+        self.fixed = set(fixed)
+        parents: Dict[int, int] = {}
+
+        def racine(v: int) -> int:
+            while parents.setdefault(v, v) != v:
+                parents[v] = parents[parents[v]]
+                v = parents[v]
+            return v
+
+        simplifiees = []
+        for clause in clauses:
+            clause = self._simplifier(clause)
+            if clause is None:
+                continue
+            simplifiees.append(clause)
+            if clause:
+                r = racine(abs(clause[0]))
+                for lit in clause[1:]:
+                    r2 = racine(abs(lit))
+                    if r2 != r:
+                        parents[r2] = r
+        self._racine = racine
+        self._composantes: Dict[int, List[List[int]]] = {}
+        for clause in simplifiees:
+            cle = racine(abs(clause[0])) if clause else 0
+            self._composantes.setdefault(cle, []).append(clause)
+
+    # None si la clause est satisfaite par les littéraux fixés, sinon la clause sans ses littéraux faux
+    def _simplifier(self, clause: List[int]) -> Optional[List[int]]:
+        simplifiee = []
+        for lit in clause:
+            if lit in self.fixed:
+                return None
+            if -lit not in self.fixed:
+                simplifiee.append(lit)
+        return simplifiee
+
+    # Sous-formule suffisante pour décider la base augmentée de la demande
+    def slice(self, requete: List[List[int]]) -> List[List[int]]:
+        formule = []
+        racines = {0}
+        for clause in requete:
+            clause = self._simplifier(clause)
+            if clause is None:
+                continue
+            formule.append(clause)
+            for lit in clause:
+                racines.add(self._racine(abs(lit)))
+        for r in racines:
+            formule += self._composantes.get(r, [])
+        return formule
+
+    # Modèle partiel : les variables de la sous-formule, complétées par les littéraux fixés
+    def complete(self, formule: List[List[int]], model: List[int]) -> List[int]:
+        variables = set(abs(lit) for clause in formule for lit in clause)
+        return [lit for lit in model if abs(lit) in variables] + list(self.fixed)
+
+
+# Énumération exhaustive bit-parallèle pour les petits résidus. Les variables inconnues sont
+# regroupées en choix exclusifs (exactement un littéral vrai par groupe, typiquement les valeurs
+# encore possibles d'une case) : l'affectation k est le k-ième élément du produit des groupes.
+# Chaque littéral est représenté par sa table de vérité, un entier dont le bit k vaut sa valeur
+# dans l'affectation k ; une clause ou une cardinalité s'évalue alors sur toutes les affectations
+# à la fois par quelques opérations sur ces entiers.
+class BruteForceEnumerator:
+    def __init__(self, groups: List[List[int]], fixed: Set[int]):
+        self.fixed = fixed
+        self.groups = groups
+        self.size = 1
+        for groupe in groups:
+            self.size *= len(groupe)
+        self.tout = (1 << self.size) - 1
+        self._tables: Dict[int, int] = {}
+        self._groupe: Dict[int, int] = {}
+        pas = 1
+        for index, groupe in enumerate(groups):
+            periode = pas * len(groupe)
+            # Motif de période pas * taille : la valeur t occupe le t-ième bloc de pas bits
+            repetition = self.tout // ((1 << periode) - 1)
+            for t, lit in enumerate(groupe):
+                self._tables[lit] = repetition * (((1 << pas) - 1) << (t * pas))
+                self._groupe[abs(lit)] = index
+            pas = periode
+
+    # Table de vérité d'un littéral, None s'il porte sur une variable ni fixée ni énumérée
+    def table(self, lit: int) -> Optional[int]:
+        if lit in self.fixed:
+            return self.tout
+        if -lit in self.fixed:
+            return 0
+        if lit in self._tables:
+            return self._tables[lit]
+        if -lit in self._tables:
+            return self.tout ^ self._tables[-lit]
+        return None
+
+    # Affectations qui satisfont toutes les clauses. Les clauses « pas deux valeurs dans le même
+    # groupe » sont vraies par construction et sautées.
+    def satisfying(self, clauses: List[List[int]]) -> int:
+        masque = self.tout
+        for clause in clauses:
+            groupes_negatifs: Dict[int, int] = {}
+            table = 0
+            for lit in clause:
+                if lit < 0 and -lit in self._groupe:
+                    index = self._groupe[-lit]
+                    if groupes_negatifs.setdefault(index, lit) != lit:
+                        table = self.tout
+                        break
+                t = self.table(lit)
+                if t is None:
+                    raise ValueError(f"Variable {abs(lit)} ni fixée ni énumérée")
+                table |= t
+                if table == self.tout:
+                    break
+            masque &= table
+            if not masque:
+                return 0
+        return masque
+
+    # Affectations où le nombre de littéraux vrais est entre at_least et at_most (None : pas de borne)
+    def cardinality(self, literals: List[int], at_least: int = 0, at_most: Optional[int] = None) -> int:
+        constante = 0
+        plans: List[int] = []
+        for lit in literals:
+            t = self.table(lit)
+            if t is None:
+                raise ValueError(f"Variable {abs(lit)} ni fixée ni énumérée")
+            if t == self.tout:
+                constante += 1
+            elif t:
+                # Compteur bit-tranché : plans[b] est le b-ième bit du nombre de littéraux vrais
+                retenue = t
+                for b in range(len(plans)):
+                    plans[b], retenue = plans[b] ^ retenue, plans[b] & retenue
+                    if not retenue:
+                        break
+                if retenue:
+                    plans.append(retenue)
+        bas = max(at_least - constante, 0)
+        haut = (1 << len(plans)) - 1 if at_most is None else min(at_most - constante, (1 << len(plans)) - 1)
+        masque = 0
+        for compte in range(bas, haut + 1):
+            egal = self.tout
+            for b, plan in enumerate(plans):
+                egal &= plan if compte >> b & 1 else self.tout ^ plan
+            masque |= egal
+        return masque
+
+    # Modèle de l'affectation k : les littéraux fixés, puis le choix de chaque groupe
+    def model(self, k: int) -> List[int]:
+        modele = list(self.fixed)
+        for groupe in self.groups:
+            t, k = k % len(groupe), k // len(groupe)
+            modele += [lit if rang == t else -lit for rang, lit in enumerate(groupe)]
+        return modele
+
+
+# Solveur CDCL incrémental, gardé en mémoire pendant toute la partie : la base de clauses
+# reste chargée, on lui ajoute les nouvelles clauses au fil de l'eau et les demandes
+# sont posées sous forme d'hypothèses (assumptions), sans jamais retirer de clauses.
+class IncrementalSolver:
+    def __init__(self, nb_var: int = 0):
+        # Numérotation interne des variables : les variables externes (celles de l'appelant)
+        # et les littéraux d'activation des demandes ne doivent pas se marcher dessus
+        self._interne: Dict[int, int] = {}
+        self._externe: List[int] = [0]
+        self.nb_var = 0
+
+        self._clauses: List[List[int]] = []
+        # Activité des clauses apprises (par index dans _clauses) : la moitié la moins active est
+        # oubliée quand elles deviennent trop nombreuses (reduceDB de MiniSat)
+        self._activite_clauses: Dict[int, float] = {}
+        self._cla_inc = 1.0
+        self._max_apprises = 2000.0
+        self._watches: Dict[int, List[int]] = {}
+        self._valeurs: List[int] = [0]
+        self._niveaux: List[int] = [0]
+        self._raisons: List[int] = [-1]
+        self._activite: List[float] = [0.0]
+        self._polarite: List[bool] = [False]
+        self._ordre: List[Tuple[float, int]] = []
+        self._trail: List[int] = []
+        self._trail_lim: List[int] = []
+        self._qhead = 0
+        self._nb_simplifies = 0
+        # Littéraux externes fixés au niveau 0, dans l'ordre, et position du trail déjà relue :
+        # les marques de fixed() comptent ces littéraux, elles survivent au compactage du trail
+        self._fixes: List[int] = []
+        self._trail_lu = 0
+        # Variables d'activation libérées par simplify, réutilisées par les demandes suivantes
+        self._activations_libres: List[int] = []
+        self._nb_desactivees = 0
+        # Comme simpDB_props de MiniSat : la base n'est reconstruite qu'après autant de propagations
+        # qu'elle a de littéraux depuis la dernière reconstruction
+        self.nb_propagations = 0
+        self._propagations_simplification = 0
+        self._var_inc = 1.0
+        self.ok = True
+        self.nb_conflits = 0
+        self.nb_appels = 0
+        # Événement consulté à chaque redémarrage : une fois levé, la recherche s'arrête (SolveCancelled)
+        self.interruption: Optional[threading.Event] = None
+
+        for var in range(1, nb_var + 1):
+            self._variable_interne(var)
+
+    def _nouvelle_variable_interne(self, externe: int) -> int:
+        v = len(self._externe)
+        self._externe.append(externe)
+        self._valeurs.append(0)
+        self._niveaux.append(0)
+        self._raisons.append(-1)
+        self._activite.append(0.0)
+        self._polarite.append(False)
+        self._watches[v] = []
+        self._watches[-v] = []
+        heapq.heappush(self._ordre, (0.0, v))
+        return v
+
+    def _variable_interne(self, var: int) -> int:
+        v = self._interne.get(var)
+        if v is None:
+            v = self._nouvelle_variable_interne(var)
+            self._interne[var] = v
+            if var > self.nb_var:
+                self.nb_var = var
+        return v
+
+    def _litteral_interne(self, lit: int) -> int:
+        v = self._variable_interne(abs(lit))
+        return v if lit > 0 else -v
+
+    def _valeur(self, lit: int) -> int:
+        val = self._valeurs[abs(lit)]
+        return val if lit > 0 else -val
+
+    def _affecter(self, lit: int, raison: int):
+        v = abs(lit)
+        self._valeurs[v] = 1 if lit > 0 else -1
+        self._niveaux[v] = len(self._trail_lim)
+        self._raisons[v] = raison
+        self._trail.append(lit)
+
+    def _attacher(self, lits: List[int], apprise: bool = False) -> int:
+        index = len(self._clauses)
+        self._clauses.append(lits)
+        self._watches[lits[0]].append(index)
+        self._watches[lits[1]].append(index)
+        if apprise:
+            self._activite_clauses[index] = self._cla_inc
+        return index
+
+    # Remplace la base par ces clauses (ancien index, littéraux), au niveau 0 uniquement : watches
+    # et activités des apprises suivent, les raisons du niveau 0 (jamais relues) sont oubliées
+    def _reconstruire(self, clauses: List[Tuple[int, List[int]]]):
+        for lit in self._trail:
+            self._raisons[abs(lit)] = -1
+        activites = self._activite_clauses
+        self._clauses = []
+        self._activite_clauses = {}
+        for lits in self._watches.values():
+            lits.clear()
+        for ancien, lits in clauses:
+            index = self._attacher(lits)
+            if ancien in activites:
+                self._activite_clauses[index] = activites[ancien]
+
+    def _ajouter_interne(self, lits: List[int]) -> bool:
+        # On est toujours au niveau 0 hors de solve : les littéraux affectés le sont définitivement
+        clause = []
+        vus = set()
+        for lit in lits:
+            val = self._valeur(lit)
+            if val == 1 or -lit in vus:
+                return True
+            if val == 0 and lit not in vus:
+                vus.add(lit)
+                clause.append(lit)
+        if not clause:
+            self.ok = False
+        elif len(clause) == 1:
+            self._affecter(clause[0], -1)
+            if self._propager() is not None:
+                self.ok = False
+        else:
+            self._attacher(clause)
+        return self.ok
+
+    def add_clause(self, clause: List[int]) -> bool:
+        if not self.ok:
+            return False
+        return self._ajouter_interne([self._litteral_interne(lit) for lit in clause])
+
+    def add_clauses(self, clauses: List[List[int]]) -> bool:
+        for clause in clauses:
+            if not self.add_clause(clause):
+                return False
+        return True
+
+    # Littéraux fixés au niveau 0, donc impliqués par la base (hors littéraux d'activation)
+    def _lire_fixes(self):
+        fin = self._trail_lim[0] if self._trail_lim else len(self._trail)
+        for lit in self._trail[self._trail_lu: fin]:
+            var = self._externe[abs(lit)]
+            if var:
+                self._fixes.append(var if lit > 0 else -var)
+        self._trail_lu = max(self._trail_lu, fin)
+
+    # Nombre de littéraux externes fixés : ceux d'avant une marque ne bougent plus
+    def fixed_mark(self) -> int:
+        self._lire_fixes()
+        return len(self._fixes)
+
+    # Littéraux externes fixés au niveau 0, à partir de la marque depuis
+    def fixed(self, depuis: int = 0) -> List[int]:
+        self._lire_fixes()
+        return self._fixes[depuis:]
+
+    # Retire les clauses satisfaites au niveau 0 (dont celles des demandes désactivées) et les
+    # littéraux faux des autres, puis reconstruit les watches. Ne fait rien sans nouveau fixé, ni
+    # tant que les propagations depuis la dernière reconstruction n'ont pas rattrapé sa taille.
+    # Les variables d'activation n'apparaissent plus dans aucune clause : elles sont retirées du
+    # trail et rendues libres pour les demandes suivantes.
+    def simplify(self) -> bool:
+        if not self.ok or self._trail_lim:
+            return self.ok
+        if self._propager() is not None:
+            self.ok = False
+            return False
+        if len(self._trail) == self._nb_simplifies or self.nb_propagations < self._propagations_simplification:
+            return True
+        valeurs = self._valeurs
+        gardees = []
+        for index, clause in enumerate(self._clauses):
+            reste = []
+            for lit in clause:
+                val = valeurs[lit] if lit > 0 else -valeurs[-lit]
+                if val == 1:
+                    break
+                if val == 0:
+                    reste.append(lit)
+            else:
+                # Propagation complète sans conflit : il reste au moins deux littéraux libres
+                gardees.append((index, reste))
+        self._reconstruire(gardees)
+        self._lire_fixes()
+        trail = []
+        for lit in self._trail:
+            v = abs(lit)
+            if self._externe[v]:
+                trail.append(lit)
+            else:
+                valeurs[v] = 0
+                self._activations_libres.append(v)
+        self._trail = trail
+        self._trail_lu = self._qhead = self._nb_simplifies = len(trail)
+        self._nb_desactivees = 0
+        self._propagations_simplification = self.nb_propagations + sum(len(clause) for clause in self._clauses)
+        return True
+
+    # Polarité préférée des prochaines décisions sur ces littéraux (sauvegarde de phase)
+    def prefer(self, literals: List[int]):
+        for lit in literals:
+            v = self._variable_interne(abs(lit))
+            self._polarite[v] = lit > 0
+
+    def _propager(self) -> Optional[int]:
+        valeurs = self._valeurs
+        while self._qhead < len(self._trail):
+            p = self._trail[self._qhead]
+            self._qhead += 1
+            self.nb_propagations += 1
+            faux = -p
+            watches = self._watches[faux]
+            gardes = []
+            k = 0
+            nb = len(watches)
+            while k < nb:
+                index = watches[k]
+                k += 1
+                clause = self._clauses[index]
+                if clause[0] == faux:
+                    clause[0] = clause[1]
+                    clause[1] = faux
+                premier = clause[0]
+                val = valeurs[premier] if premier > 0 else -valeurs[-premier]
+                if val == 1:
+                    gardes.append(index)
+                    continue
+                trouve = False
+                for idx in range(2, len(clause)):
+                    lit = clause[idx]
+                    if (valeurs[lit] if lit > 0 else -valeurs[-lit]) != -1:
+                        clause[1] = lit
+                        clause[idx] = faux
+                        self._watches[lit].append(index)
+                        trouve = True
+                        break
+                if trouve:
+                    continue
+                gardes.append(index)
+                if val == -1:
+                    gardes.extend(watches[k:])
+                    self._watches[faux] = gardes
+                    self._qhead = len(self._trail)
+                    return index
+                self._affecter(premier, index)
+            self._watches[faux] = gardes
+        return None
+
+    def _augmenter_activite(self, v: int):
+        self._activite[v] += self._var_inc
+        if self._activite[v] > 1e100:
+            for u in range(1, len(self._activite)):
+                self._activite[u] *= 1e-100
+            self._var_inc *= 1e-100
+            self._reconstruire_ordre()
+        elif self._valeurs[v] == 0:
+            heapq.heappush(self._ordre, (-self._activite[v], v))
+
+    def _augmenter_activite_clause(self, index: int):
+        self._activite_clauses[index] += self._cla_inc
+        if self._activite_clauses[index] > 1e20:
+            for i in self._activite_clauses:
+                self._activite_clauses[i] *= 1e-20
+            self._cla_inc *= 1e-20
+
+    # Oublie la moitié la moins active des clauses apprises (hors binaires), au niveau 0 : aucune
+    # n'est alors raison d'une affectation relue par l'analyse
+    def _reduire_apprises(self):
+        apprises = sorted(
+            (activite, index) for index, activite in self._activite_clauses.items()
+            if len(self._clauses[index]) > 2
+        )
+        oubliees = {index for _, index in apprises[: len(apprises) // 2]}
+        self._reconstruire([
+            (index, clause) for index, clause in enumerate(self._clauses) if index not in oubliees
+        ])
+        self._max_apprises *= 1.1
+
+    def _reconstruire_ordre(self):
+        self._ordre = [
+            (-self._activite[v], v)
+            for v in range(1, len(self._valeurs))
+            if self._valeurs[v] == 0
+        ]
+        heapq.heapify(self._ordre)
+
+    def _analyser(self, conflit: int) -> Tuple[List[int], int]:
+        niveau_courant = len(self._trail_lim)
+        vus = set()
+        appris = [0]
+        compteur = 0
+        p = 0
+        index = len(self._trail) - 1
+        clause = self._clauses[conflit]
+        raison = conflit
+        while True:
+            if raison in self._activite_clauses:
+                self._augmenter_activite_clause(raison)
+            for q in clause:
+                if q == p:
+                    continue
+                v = abs(q)
+                if v not in vus and self._niveaux[v] > 0:
+                    vus.add(v)
+                    self._augmenter_activite(v)
+                    if self._niveaux[v] >= niveau_courant:
+                        compteur += 1
+                    else:
+                        appris.append(q)
+            while abs(self._trail[index]) not in vus:
+                index -= 1
+            p = self._trail[index]
+            index -= 1
+            vus.discard(abs(p))
+            compteur -= 1
+            if compteur == 0:
+                break
+            raison = self._raisons[abs(p)]
+            clause = self._clauses[raison]
+        appris[0] = -p
+
+        niveau_retour = 0
+        if len(appris) > 1:
+            # Le littéral du plus haut niveau (hors UIP) devient le second watch
+            meilleur = 1
+            for idx in range(2, len(appris)):
+                if self._niveaux[abs(appris[idx])] > self._niveaux[abs(appris[meilleur])]:
+                    meilleur = idx
+            appris[1], appris[meilleur] = appris[meilleur], appris[1]
+            niveau_retour = self._niveaux[abs(appris[1])]
+        return appris, niveau_retour
+
+    def _revenir_au_niveau(self, niveau: int):
+        if len(self._trail_lim) <= niveau:
+            return
+        limite = self._trail_lim[niveau]
+        for lit in self._trail[limite:]:
+            v = abs(lit)
+            self._polarite[v] = lit > 0
+            self._valeurs[v] = 0
+            self._raisons[v] = -1
+            heapq.heappush(self._ordre, (-self._activite[v], v))
+        del self._trail[limite:]
+        del self._trail_lim[niveau:]
+        self._qhead = limite
+        if len(self._ordre) > 8 * len(self._valeurs) + 1000:
+            self._reconstruire_ordre()
+
+    def _choisir_variable(self) -> int:
+        while self._ordre:
+            _, v = heapq.heappop(self._ordre)
+            if self._valeurs[v] == 0:
+                return v
+        return 0
+
+    def _modele(self) -> List[int]:
+        modele = [-var for var in range(1, self.nb_var + 1)]
+        for v in range(1, len(self._valeurs)):
+            var = self._externe[v]
+            if var and self._valeurs[v] == 1:
+                modele[var - 1] = var
+        return modele
+
+    @staticmethod
+    def _luby(i: int) -> int:
+        taille, sequence = 1, 0
+        while taille < i + 1:
+            sequence += 1
+            taille = 2 * taille + 1
+        while taille - 1 != i:
+            taille = (taille - 1) >> 1
+            sequence -= 1
+            i = i % taille
+        return 1 << sequence
+
+    def _resoudre(self, hypotheses: List[int]) -> Tuple[bool, List[int]]:
+        self.nb_appels += 1
+        if not self.ok:
+            return False, []
+        nb_redemarrages = 0
+        limite_conflits = 100 * self._luby(nb_redemarrages)
+        conflits = 0
+        while True:
+            conflit = self._propager()
+            if conflit is not None:
+                self.nb_conflits += 1
+                conflits += 1
+                if not self._trail_lim:
+                    self.ok = False
+                    return False, []
+                appris, niveau_retour = self._analyser(conflit)
+                self._revenir_au_niveau(niveau_retour)
+                if len(appris) == 1:
+                    self._affecter(appris[0], -1)
+                else:
+                    self._affecter(appris[0], self._attacher(appris, apprise=True))
+                self._var_inc *= 1.05
+                self._cla_inc *= 1 / 0.999
+                continue
+
+            if conflits >= limite_conflits:
+                nb_redemarrages += 1
+                limite_conflits = 100 * self._luby(nb_redemarrages)
+                conflits = 0
+                self._revenir_au_niveau(0)
+                if self.interruption is not None and self.interruption.is_set():
+                    raise SolveCancelled("recherche interrompue")
+                if len(self._activite_clauses) >= self._max_apprises:
+                    self._reduire_apprises()
+                continue
+
+            niveau = len(self._trail_lim)
+            if niveau < len(hypotheses):
+                # Les hypothèses sont posées en premier, une par niveau de décision
+                lit = hypotheses[niveau]
+                val = self._valeur(lit)
+                if val == -1:
+                    self._revenir_au_niveau(0)
+                    return False, []
+                self._trail_lim.append(len(self._trail))
+                if val == 0:
+                    self._affecter(lit, -1)
+                continue
+
+            v = self._choisir_variable()
+            if v == 0:
+                modele = self._modele()
+                self._revenir_au_niveau(0)
+                return True, modele
+            self._trail_lim.append(len(self._trail))
+            self._affecter(v if self._polarite[v] else -v, -1)
+
+    def solve(self, assumptions: List[int] = ()) -> Tuple[bool, List[int]]:
+        return self._resoudre([self._litteral_interne(lit) for lit in assumptions])
+
+    # Résout la base augmentée de clauses temporaires : les clauses unitaires deviennent des
+    # hypothèses, les autres sont gardées par un littéral d'activation désactivé ensuite. Les
+    # variables d'activation sont recyclées : au-delà de SEUIL_RECYCLAGE désactivées, simplify les
+    # libère (si son budget de propagations le permet).
+    SEUIL_RECYCLAGE = 256
+
+    def solve_with(self, clauses: List[List[int]]) -> Tuple[bool, List[int]]:
+        if not self.ok or any(len(clause) == 0 for clause in clauses):
+            return False, []
+        if self._nb_desactivees >= self.SEUIL_RECYCLAGE:
+            self.simplify()
+        hypotheses = []
+        activations = []
+        for clause in clauses:
+            if len(clause) == 1:
+                hypotheses.append(self._litteral_interne(clause[0]))
+            else:
+                if self._activations_libres:
+                    a = self._activations_libres.pop()
+                else:
+                    a = self._nouvelle_variable_interne(0)
+                self._ajouter_interne([-a] + [self._litteral_interne(lit) for lit in clause])
+                activations.append(a)
+                hypotheses.append(a)
+        try:
+            return self._resoudre(hypotheses)
+        finally:
+            # Aussi quand la recherche est interrompue : les clauses de la demande sont désactivées
+            self._revenir_au_niveau(0)
+            for a in activations:
+                self._ajouter_interne([-a])
+            self._nb_desactivees += len(activations)
+
+
+# Lecture d'une formule DIMACS depuis un buffer en mémoire
+def parse_dimacs(dimacs: str) -> Tuple[List[List[int]], int]:
+    clauses = []
+    nb_var = 0
+    clause = []
+    for line in dimacs.splitlines():
+        if not line or line[0] in "c%":
+            continue
+        if line[0] == "p":
+            nb_var = int(line.split()[2])
+            continue
+        for x in line.split():
+            lit = int(x)
+            if lit == 0:
+                clauses.append(clause)
+                clause = []
+            else:
+                clause.append(lit)
+    return clauses, nb_var
+
+
+# Lecture de la sortie d'un solveur : format de la compétition SAT ("s ..." puis lignes "v ...")
+# ou format minisat (SAT/UNSAT puis le modèle sur une ligne)
+def parse_solver_output(sortie: str) -> Tuple[bool, List[int]]:
+    sat = False
+    model = []
+    for line in sortie.splitlines():
+        line = line.strip()
+        if line.startswith("s "):
+            line = line[2:].strip()
+        if line in ("SATISFIABLE", "SAT"):
+            sat = True
+        elif line in ("UNSATISFIABLE", "UNSAT"):
+            return False, []
+        elif line.startswith("v "):
+            model += [int(x) for x in line[2:].split() if x != "0"]
+        elif sat and line and line.lstrip("-")[:1].isdigit():
+            model += [int(x) for x in line.split() if x != "0"]
+    return sat, model
+
+
+# Espace de travail propre à une session : un répertoire unique (sur tmpfs quand /dev/shm existe)
+# où chaque demande reçoit ses propres noms de fichiers. Plusieurs parties lancées depuis le même
+# répertoire ne se marchent donc plus dessus. Les fichiers d'une demande sont supprimés dès sa
+# réponse lue, le répertoire à la fermeture (ou à la sortie du programme).
+class ScratchSpace:
+    def __init__(self, prefix: str = "hitman-"):
+        racine = "/dev/shm" if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK) else None
+        self.path = tempfile.mkdtemp(prefix=prefix, dir=racine)
+        # next() sur un compteur est atomique : les threads du pool ont chacun leur nom
+        self._compteur = itertools.count()
+        self.closed = False
+        atexit.register(self.close)
+
+    def new_path(self, suffix: str = "") -> str:
+        return os.path.join(self.path, f"{next(self._compteur)}{suffix}")
+
+    def close(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+        self.closed = True
+        atexit.unregister(self.close)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+_scratch: Optional[ScratchSpace] = None
+_verrou_scratch = threading.Lock()
+
+
+# Espace de travail de la session, créé au premier besoin. Les threads du pool peuvent
+# l'appeler en même temps : sans verrou, chacun créerait (et perdrait) son propre répertoire
+def scratch_space() -> ScratchSpace:
+    global _scratch
+    with _verrou_scratch:
+        if _scratch is None or _scratch.closed:
+            _scratch = ScratchSpace()
+        return _scratch
+
+
+# Levée par un backend dont la résolution a été annulée (événement stop levé en cours de route)
+class SolveCancelled(Exception):
+    pass
+
+
+class SatBackend:
+    name = ""
+
+    def available(self) -> bool:
+        return True
+
+    def solve(self, dimacs: str, stop: Optional[threading.Event] = None) -> Tuple[bool, List[int]]:
+        raise NotImplementedError
+
+    def solve_clauses(
+        self, clauses: List[List[int]], nb_var: int, stop: Optional[threading.Event] = None
+    ) -> Tuple[bool, List[int]]:
+        return self.solve(clauses_to_dimacs(clauses, nb_var), stop)
+
+
+# N'importe quel solveur qui lit du DIMACS : la formule lui est envoyée par un pipe sur
+# son entrée standard, aucun fichier n'est écrit sur le disque. Un solveur qui ne sait lire
+# (ou écrire) que des fichiers utilise les marqueurs {cnf} et {out} dans sa commande : ils
+# sont remplacés par des fichiers uniques de l'espace de travail de la session.
+class DimacsBackend(SatBackend):
+    def __init__(self, name: str, cmd: List[str], encoding: str = "utf8"):
+        self.name = name
+        self.cmd = cmd
+        self.encoding = encoding
+
+    def available(self) -> bool:
+        return shutil.which(self.cmd[0]) is not None
+
+    def solve(self, dimacs: str, stop: Optional[threading.Event] = None) -> Tuple[bool, List[int]]:
+        if "{cnf}" not in self.cmd and "{out}" not in self.cmd:
+            return self._executer(self.cmd, dimacs, stop=stop)
+        scratch = scratch_space()
+        fichiers = {"{cnf}": scratch.new_path(".cnf"), "{out}": scratch.new_path(".out")}
+        cmd = [fichiers.get(arg, arg) for arg in self.cmd]
+        try:
+            entree = dimacs
+            if "{cnf}" in self.cmd:
+                write_dimacs_file(dimacs, fichiers["{cnf}"])
+                entree = None
+            result = self._executer(cmd, entree, "{out}" not in self.cmd, stop)
+            if "{out}" in self.cmd:
+                with open(fichiers["{out}"], encoding=self.encoding) as sortie:
+                    result = parse_solver_output(sortie.read())
+            return result
+        finally:
+            for fichier in fichiers.values():
+                if os.path.exists(fichier):
+                    os.remove(fichier)
+
+    # Avec un événement stop, l'échange avec le solveur se fait dans un thread à part : on le
+    # surveille par tranches de 10 ms et on tue le solveur dès que l'événement est levé.
+    # communicate() ne peut pas être relancé avec l'entrée après un timeout, d'où le thread.
+    def _executer(
+        self, cmd: List[str], entree: Optional[str], lire_sortie: bool = True,
+        stop: Optional[threading.Event] = None,
+    ) -> Tuple[bool, List[int]]:
+        with subprocess.Popen(
+            cmd, stdin=subprocess.PIPE if entree is not None else None,
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, encoding=self.encoding,
+        ) as process:
+            if stop is None:
+                stdout, stderr = process.communicate(entree)
+            else:
+                sorties: List[Tuple[str, str]] = []
+                echange = threading.Thread(
+                    target=lambda: sorties.append(process.communicate(entree)), daemon=True
+                )
+                echange.start()
+                while echange.is_alive():
+                    echange.join(0.01)
+                    if stop.is_set() and echange.is_alive():
+                        process.kill()
+                        # Un petit-fils peut garder les tubes ouverts : on n'attend pas plus
+                        echange.join(0.1)
+                        raise SolveCancelled(self.name)
+                if not sorties:
+                    raise subprocess.CalledProcessError(process.wait(), cmd)
+                stdout, stderr = sorties[0]
+        # Convention des compétitions SAT : 10 pour SAT, 20 pour UNSAT
+        if process.returncode not in (0, 10, 20):
+            raise subprocess.CalledProcessError(process.returncode, cmd, stdout, stderr)
+        return parse_solver_output(stdout) if lire_sortie else (False, [])
+
+
+# Repli en pur Python : la formule est relue depuis le buffer par le solveur CDCL
+class PythonBackend(SatBackend):
+    name = "python"
+
+    def solve(self, dimacs: str, stop: Optional[threading.Event] = None) -> Tuple[bool, List[int]]:
+        return self.solve_clauses(*parse_dimacs(dimacs), stop)
+
+    def solve_clauses(
+        self, clauses: List[List[int]], nb_var: int, stop: Optional[threading.Event] = None
+    ) -> Tuple[bool, List[int]]:
+        solver = IncrementalSolver(nb_var)
+        solver.interruption = stop
+        if not solver.add_clauses(clauses):
+            return False, []
+        return solver.solve()
+
+
+BACKENDS: Dict[str, Callable[[], SatBackend]] = {}
+
+
+def register_backend(name: str, factory: Callable[[], SatBackend]):
+    BACKENDS[name] = factory
+
+
+# Renvoie le backend demandé, ou le repli Python si son exécutable est introuvable
+def get_backend(name: str = "gophersat") -> SatBackend:
+    backend = BACKENDS[name]()
+    if not backend.available():
+        print(f"Backend SAT {name} introuvable, repli sur le solveur Python", file=sys.stderr)
+        backend = BACKENDS["python"]()
+    return backend
+
+
+def available_backends() -> List[str]:
+    return [name for name, factory in BACKENDS.items() if factory().available()]
+
+
+# Sans /dev/stdin (Windows), les solveurs qui attendent un nom de fichier passent par l'espace de travail
+PIPES = os.path.exists("/dev/stdin") and os.path.exists("/dev/stdout")
+register_backend("gophersat", lambda: DimacsBackend(
+    "gophersat", ["gophersat", "/dev/stdin" if PIPES else "{cnf}"]
+))
+register_backend("minisat", lambda: DimacsBackend(
+    "minisat", ["minisat", "-verb=0", "/dev/stdin", "/dev/stdout"] if PIPES else ["minisat", "-verb=0", "{cnf}", "{out}"]
+))
+register_backend("kissat", lambda: DimacsBackend("kissat", ["kissat", "-q"]))
+register_backend("python", PythonBackend)
+
+
+# Portefeuille : la même formule part en parallèle sur chaque membre, la première réponse gagne
+# et les autres sont annulées. Après une période d'essai, un membre qui ne gagne presque jamais
+# est retiré (il reste toujours au moins un membre).
+class PortfolioBackend(SatBackend):
+    name = "portfolio"
+
+    def __init__(self, members: List[SatBackend], essai: int = 20, taux_minimal: float = 0.05):
+        self.members = list(members)
+        self.essai = essai
+        self.taux_minimal = taux_minimal
+        self.victoires: Dict[str, int] = {member.name: 0 for member in self.members}
+        self.courses: Dict[str, int] = {member.name: 0 for member in self.members}
+        self.temps_gagnant: Dict[str, float] = {member.name: 0.0 for member in self.members}
+        self.retires: List[str] = []
+        self._verrou = threading.Lock()
+        # Un lot de courses simultanées (SolverPool) ne doit pas manquer de threads
+        self._executor = ThreadPoolExecutor(max_workers=len(self.members) * (os.cpu_count() or 1))
+
+    def available(self) -> bool:
+        return any(member.available() for member in self.members)
+
+    def solve(self, dimacs: str, stop: Optional[threading.Event] = None) -> Tuple[bool, List[int]]:
+        members = self.members
+        if len(members) == 1:
+            return members[0].solve(dimacs, stop)
+        stop_course = threading.Event()
+        debut = time.perf_counter()
+        futures = {self._executor.submit(member.solve, dimacs, stop_course): member for member in members}
+        en_cours = set(futures)
+        erreur: Optional[Exception] = None
+        try:
+            while en_cours:
+                # Avec un stop de l'appelant, on le surveille par tranches de 10 ms et on le relaie
+                # aux membres ; une course annulée ne compte pas dans les statistiques
+                finis, en_cours = wait(en_cours, timeout=None if stop is None else 0.01, return_when=FIRST_COMPLETED)
+                for future in finis:
+                    try:
+                        result = future.result()
+                    except SolveCancelled:
+                        continue
+                    except (subprocess.CalledProcessError, OSError) as e:
+                        erreur = e
+                        continue
+                    self._enregistrer(members, futures[future], time.perf_counter() - debut)
+                    return result
+                if stop is not None and stop.is_set():
+                    raise SolveCancelled(self.name)
+        finally:
+            stop_course.set()
+        if erreur is None:
+            raise SolveCancelled(self.name)
+        raise erreur
+
+    def _enregistrer(self, members: List[SatBackend], gagnant: SatBackend, temps: float):
+        with self._verrou:
+            self.victoires[gagnant.name] += 1
+            self.temps_gagnant[gagnant.name] += temps
+            for member in members:
+                self.courses[member.name] += 1
+            lents = [
+                member for member in self.members
+                if self.courses[member.name] >= self.essai
+                and self.victoires[member.name] < self.taux_minimal * self.courses[member.name]
+            ]
+            if lents and len(lents) < len(self.members):
+                self.members = [member for member in self.members if member not in lents]
+                self.retires += [member.name for member in lents]
+
+    # Par membre : (victoires, courses, temps moyen quand il gagne)
+    def stats(self) -> Dict[str, Tuple[int, int, float]]:
+        return {
+            name: (self.victoires[name], self.courses[name], self.temps_gagnant[name] / max(self.victoires[name], 1))
+            for name in self.courses
+        }
+
+
+# Tous les backends externes disponibles, ou le repli Python s'il y en a moins de deux
+def portfolio_backend() -> PortfolioBackend:
+    members = [BACKENDS[name]() for name in ("gophersat", "minisat", "kissat")]
+    members = [member for member in members if member.available()]
+    if len(members) < 2:
+        members.append(PythonBackend())
+    return PortfolioBackend(members)
+
+
+register_backend("portfolio", portfolio_backend)
+
+
+# Pool de workers pour résoudre un lot de formules indépendantes : chaque formule part dans un
+# processus solveur séparé, les threads ne font qu'attendre leur sous-processus
+class SolverPool:
+    def __init__(self, backend: SatBackend, workers: Optional[int] = None):
+        self.backend = backend
+        self.workers = workers or os.cpu_count() or 1
+        self._executor = ThreadPoolExecutor(max_workers=self.workers)
+
+    def solve_batch(self, formulas: List[str]) -> List[Tuple[bool, List[int]]]:
+        if len(formulas) <= 1:
+            return [self.backend.solve(formula) for formula in formulas]
+        return list(self._executor.map(self.backend.solve, formulas))
+
+    # Disjonction de formules (les cubes d'une même demande) : SAT dès que l'une l'est, les
+    # résolutions encore en cours sont alors annulées ; UNSAT seulement si toutes le sont
+    def solve_any(self, formulas: List[str]) -> Tuple[bool, List[int]]:
+        stop = threading.Event()
+        futures = [self._executor.submit(self.backend.solve, formula, stop) for formula in formulas]
+        try:
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except SolveCancelled:
+                    continue
+                if result[0]:
+                    return result
+        finally:
+            stop.set()
+        return False, []
+
+    def close(self):
+        self._executor.shutdown()
+
+
+# ------------- WORKERS RÉSIDENTS -------------
+# Un worker est un processus Python lancé une fois (python reso_SAT.py --worker) qui garde un
+# IncrementalSolver chargé. Protocole ligne à ligne sur son entrée standard :
+#   a <littéraux> 0   ajoute une clause à la base du worker
+#   q <littéraux> 0   ajoute une clause à la demande en cours
+#   s                 résout la base avec la demande, répond "SAT <modèle> 0" ou "UNSAT"
+# Pas de démarrage de processus ni de relecture du DIMACS par demande : seuls les deltas passent.
+# SIGUSR1 interrompt la résolution en cours, qui répond alors "CANCELLED".
+def worker_main(entree=sys.stdin, sortie=sys.stdout):
+    solveur = IncrementalSolver()
+    solveur.interruption = threading.Event()
+    if hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, lambda *_: solveur.interruption.set())
+    demande: List[List[int]] = []
+    for ligne in entree:
+        morceaux = ligne.split()
+        if not morceaux:
+            continue
+        if morceaux[0] == "a":
+            solveur.add_clause([int(lit) for lit in morceaux[1:-1]])
+        elif morceaux[0] == "q":
+            demande.append([int(lit) for lit in morceaux[1:-1]])
+        elif morceaux[0] == "s":
+            # L'interruption peut arriver avant même la lecture de la demande : elle n'est effacée
+            # qu'après la réponse (une interruption tardive annule la demande suivante, que le
+            # client repose)
+            try:
+                sat, modele = solveur.solve_with(demande)
+                sortie.write(f"SAT {' '.join(str(lit) for lit in modele)} 0\n" if sat else "UNSAT\n")
+            except SolveCancelled:
+                sortie.write("CANCELLED\n")
+            demande = []
+            sortie.flush()
+            solveur.interruption.clear()
+
+
+# Côté client : un worker, le nombre de clauses du journal commun qu'il a déjà reçues et
+# s'il a une demande en cours
+class _Worker:
+    def __init__(self):
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--worker"],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, encoding="utf8", bufsize=1,
+        )
+        self.envoyees = 0
+        self.occupe = False
+        self.interrompu = False
+        # Avant sa première réponse, le worker n'a peut-être pas encore installé son gestionnaire de
+        # SIGUSR1 (le signal le tuerait)
+        self.pret = False
+
+    # Demande au worker d'abandonner la demande en cours et de refuser les suivantes jusqu'à
+    # remise à zéro de interrompu (sans signal hors POSIX : la demande en cours va à son terme)
+    def interrupt(self):
+        self.interrompu = True
+        if self.occupe and self.pret and hasattr(signal, "SIGUSR1") and self.process.poll() is None:
+            self.process.send_signal(signal.SIGUSR1)
+
+    def close(self):
+        if self.process.poll() is None:
+            self.process.stdin.close()
+            self.process.wait()
+
+
+# Pool de workers résidents qui partagent une même base : les clauses ajoutées vont dans un journal,
+# chaque worker en reçoit la suite avant sa prochaine demande. Un worker qui plante est relancé
+# et le journal lui est rejoué en entier.
+class WorkerPool:
+    def __init__(self, workers: Optional[int] = None):
+        self._journal: List[List[int]] = []
+        self._workers = [_Worker() for _ in range(workers or min(4, os.cpu_count() or 1))]
+        self._executor = ThreadPoolExecutor(max_workers=len(self._workers))
+
+    def add_clauses(self, clauses: List[List[int]]):
+        self._journal += clauses
+
+    def _resoudre(self, index: int, requete: List[List[int]]) -> Tuple[bool, List[int]]:
+        for essai in range(2):
+            worker = self._workers[index]
+            try:
+                lignes = [f"a {clauses_to_text([clause])}" for clause in self._journal[worker.envoyees:]]
+                lignes += [f"q {clauses_to_text([clause])}" for clause in requete]
+                worker.occupe = True
+                if worker.interrompu:
+                    worker.occupe = False
+                    raise SolveCancelled("worker interrompu")
+                worker.process.stdin.write("".join(lignes) + "s\n")
+                worker.process.stdin.flush()
+                worker.envoyees = len(self._journal)
+                reponse = worker.process.stdout.readline().split()
+                worker.occupe = False
+                if not reponse:
+                    raise BrokenPipeError("worker arrêté")
+                worker.pret = True
+            except (BrokenPipeError, OSError):
+                worker.occupe = False
+                if essai:
+                    raise
+                worker.close()
+                self._workers[index] = _Worker()
+                continue
+            if reponse[0] == "CANCELLED":
+                if worker.interrompu:
+                    raise SolveCancelled("worker interrompu")
+                # Interruption destinée à une demande précédente : on repose celle-ci
+                return self._resoudre(index, requete)
+            if reponse[0] == "UNSAT":
+                return False, []
+            return True, [int(lit) for lit in reponse[1:-1]]
+
+    @property
+    def size(self) -> int:
+        return len(self._workers)
+
+    # Les demandes du lot sont réparties sur les workers, chacun traite les siennes dans l'ordre
+    def solve_batch(self, requetes: List[List[List[int]]]) -> List[Tuple[bool, List[int]]]:
+        resultats: List[Optional[Tuple[bool, List[int]]]] = [None] * len(requetes)
+
+        def traiter(index: int):
+            for k in range(index, len(requetes), len(self._workers)):
+                resultats[k] = self._resoudre(index, requetes[k])
+
+        list(self._executor.map(traiter, range(min(len(self._workers), len(requetes)))))
+        return resultats
+
+    # Une demande découpée en cubes : chaque worker prend le cube suivant tant qu'aucun n'est SAT.
+    # Le premier cube SAT interrompt les cubes encore en cours sur les autres workers.
+    # UNSAT seulement si tous les cubes le sont.
+    def solve_cubes(self, requete: List[List[int]], cubes: List[List[int]]) -> Tuple[bool, List[int]]:
+        restants = iter(cubes)
+        verrou = threading.Lock()
+        trouve: List[Tuple[bool, List[int]]] = []
+        nb = min(len(self._workers), len(cubes))
+
+        def traiter(index: int):
+            while not trouve:
+                with verrou:
+                    cube = next(restants, None)
+                if cube is None:
+                    return
+                try:
+                    result = self._resoudre(index, requete + [[lit] for lit in cube])
+                except SolveCancelled:
+                    return
+                if result[0]:
+                    with verrou:
+                        trouve.append(result)
+                        for autre in range(nb):
+                            if autre != index:
+                                self._workers[autre].interrupt()
+
+        try:
+            list(self._executor.map(traiter, range(nb)))
+        finally:
+            for worker in self._workers:
+                worker.interrompu = False
+        return trouve[0] if trouve else (False, [])
+
+    def close(self):
+        self._executor.shutdown()
+        for worker in self._workers:
+            worker.close()
+
+
+# Cubes d'un découpage : pour chaque point de découpage, des alternatives (listes de littéraux)
+# qui couvrent à elles toutes l'espace ; un cube par combinaison d'alternatives
+def make_cubes(alternatives: List[List[List[int]]]) -> List[List[int]]:
+    return [[lit for choix in combinaison for lit in choix] for combinaison in itertools.product(*alternatives)]
+
+
+# Modèles d'une formule sur les variables 1..nb_var, par énumération (chaque modèle en masque de bits)
+def brute_force_models(clauses: List[List[int]], nb_var: int) -> List[int]:
+    return [
+        masque for masque in range(1 << nb_var)
+        if all(any((masque >> (abs(lit) - 1) & 1) == (lit > 0) for lit in clause) for clause in clauses)
+    ]
+
+
+# Vérification croisée contre la force brute (python reso_SAT.py --check) : des formules
+# aléatoires sur peu de variables sont posées par morceaux au solveur incrémental, entrecoupées
+# de demandes, de simplifications et d'ajouts au ClauseStore ; le recyclage des activations et
+# l'oubli des apprises sont forcés. Des formules aléatoires plus grosses (3-SAT au seuil) sont
+# ensuite résolues avec et sans oubli des apprises. Renvoie le nombre d'écarts trouvés.
+def self_check(essais: int = 200, graine: int = 0, sortie=sys.stdout) -> int:
+    rng = random.Random(graine)
+    erreurs = 0
+
+    def ecart(message: str):
+        nonlocal erreurs
+        erreurs += 1
+        sortie.write(f"écart (essai {essai}) : {message}\n")
+
+    def clause_aleatoire(nb_var: int, taille: int) -> List[int]:
+        return [rng.choice((-1, 1)) * v for v in rng.sample(range(1, nb_var + 1), taille)]
+
+    def satisfait(modele: List[int], clauses: List[List[int]]) -> bool:
+        vrais = set(modele)
+        return all(any(lit in vrais for lit in clause) for clause in clauses)
+
+    for essai in range(essais):
+        nb_var = rng.randint(3, 10)
+        solveur = IncrementalSolver(nb_var)
+        solveur.SEUIL_RECYCLAGE = 2
+        solveur._max_apprises = 2
+        store = ClauseStore()
+        base: List[List[int]] = []
+        for _ in range(rng.randint(2, 6)):
+            morceau = [clause_aleatoire(nb_var, rng.randint(1, min(3, nb_var))) for _ in range(rng.randint(1, nb_var))]
+            base += morceau
+            solveur.add_clauses(morceau)
+            store.add_all(morceau)
+            modeles = brute_force_models(base, nb_var)
+            if brute_force_models(store.clauses(), nb_var) != modeles:
+                ecart("ClauseStore n'est plus équivalent à ses clauses")
+            sat, modele = solveur.solve()
+            if sat != bool(modeles) or (sat and not satisfait(modele, base)):
+                ecart(f"solve : {sat} au lieu de {bool(modeles)}")
+            for lit in solveur.fixed():
+                if any((masque >> (abs(lit) - 1) & 1) != (lit > 0) for masque in modeles):
+                    ecart(f"fixed : {lit} n'est pas impliqué")
+            for _ in range(rng.randint(1, 8)):
+                demande = [clause_aleatoire(nb_var, rng.randint(1, min(3, nb_var))) for _ in range(rng.randint(1, 3))]
+                attendu = bool(brute_force_models(base + demande, nb_var))
+                sat, modele = solveur.solve_with(demande)
+                if sat != attendu or (sat and not satisfait(modele, base + demande)):
+                    ecart(f"solve_with {demande} : {sat} au lieu de {attendu}")
+            if rng.random() < 0.5:
+                solveur.simplify()
+                store.simplify(solveur.fixed())
+        actives = len(solveur._externe) - 1 - nb_var
+        if actives > 2 * solveur.SEUIL_RECYCLAGE + 3 * 8:
+            ecart(f"{actives} variables d'activation : elles ne sont pas recyclées")
+
+    # Pas de force brute possible ici : les modèles sont vérifiés, les réponses comparées
+    for essai in range(essais // 10):
+        nb_var = rng.randint(100, 150)
+        formule = [clause_aleatoire(nb_var, 3) for _ in range(int(4.26 * nb_var))]
+        reponses = []
+        for max_apprises in (5.0, float("inf")):
+            solveur = IncrementalSolver(nb_var)
+            solveur._max_apprises = max_apprises
+            solveur.add_clauses(formule)
+            sat, modele = solveur.solve()
+            if sat and not satisfait(modele, formule):
+                ecart("modèle faux sur 3-SAT")
+            reponses.append(sat)
+        if reponses[0] != reponses[1]:
+            ecart(f"3-SAT : {reponses[0]} avec oubli des apprises, {reponses[1]} sans")
+
+    # Tiroirs : trous + 1 pigeons dans trous trous, toujours insatisfaisable
+    for trous in range(2, 7):
+        essai = trous
+        pigeon = [[p * trous + t + 1 for t in range(trous)] for p in range(trous + 1)]
+        formule = pigeon + [
+            [-pigeon[p][t], -pigeon[q][t]] for t in range(trous) for p in range(trous + 1) for q in range(p)
+        ]
+        solveur = IncrementalSolver()
+        solveur._max_apprises = 5.0
+        if solveur.add_clauses(formule) and solveur.solve()[0]:
+            ecart(f"tiroirs à {trous} trous déclarés satisfaisables")
+    return erreurs
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["--worker"]:
+        worker_main()
+    elif sys.argv[1:2] == ["--check"]:
+        nb_erreurs = self_check(*(int(arg) for arg in sys.argv[2:4]))
+        print(f"{nb_erreurs} écart(s)")
+        sys.exit(1 if nb_erreurs else 0)